@@ -0,0 +1,165 @@
+import random
+import sys
+import time
+import tracemalloc
+
+from lexer import Lexer
+from parser_ import Parser
+from program import compile, ProgramCache
+from interpreter import Interpreter
+from context import Context, SymbolTable
+
+# Performance benchmarks for the interpreter front end and runtime
+# Run with: python benchmark.py [name ...]
+
+SNIPPETS = [
+    'var value_{n} = {n} * 4 + {n}.5 / (2 - 1) % 3',
+    'function compute_{n}(a, b: int):\n    var s = 0\n    for i, b:\n        s = s + a * i\n    end\n    return s\nend',
+    'if value_{n} >= 10 and not value_{n} == 3 or false: write("value {n} is big\\n") end',
+    'class Counter_{n}:\n    var count = 0\n    private var name = \'counter_{n}\'\n    function Counter_{n}(start): this.count = start end\nend',
+    'trigger on_message(contains(message.content, "keyword_{n}")): write(message.author) end',
+    'var list_{n} = [1, 2.0, "three", true, void], list_{n}[0] = list_{n}[1]',
+]
+
+# Returns a generated dsl source of roughly the given size in bytes
+def generate_source(size, seed=0):
+    generator = random.Random(seed)
+    lines = []
+    total = 0
+    n = 0
+    while total < size:
+        line = generator.choice(SNIPPETS).format(n=n)
+        lines.append(line)
+        total += len(line) + 1
+        n += 1
+    return '\n'.join(lines)
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# Lexer throughput in MB/s over generated sources
+def benchmark_lexer(sizes=(100_000, 1_000_000, 5_000_000), repeat=3):
+    for size in sizes:
+        source = generate_source(size)
+        megabytes = len(source.encode('utf8')) / 1_000_000
+        tokens = []
+        elapsed = best_time(lambda: tokens.append(sum(1 for _ in Lexer(source).generate_tokens())), repeat)
+        print(f'lexer   {megabytes:8.2f} MB  {tokens[-1]:>9} tokens  {elapsed * 1000:9.1f} ms  {megabytes / elapsed:7.2f} MB/s')
+
+# Parser throughput over generated sources, long arithmetic expressions and nested calls
+def benchmark_parser(repeat=3):
+    sources = {
+        'generated 1 MB':       generate_source(1_000_000),
+        'arithmetic':           ' + '.join(f'{n} * x - y / {n} % 3' for n in range(20_000)),
+        'nested calls':         ', '.join('f(' * 50 + 'x' + ')' * 50 for _ in range(500)),
+    }
+    for name, source in sources.items():
+        tokens = list(Lexer(source).generate_tokens())
+        elapsed = best_time(lambda: Parser(tokens).parse(), repeat)
+        print(f'parser  {name:20} {len(tokens):>9} tokens  {elapsed * 1000:9.1f} ms  {len(tokens) / elapsed / 1000:7.1f} k tokens/s')
+
+# Front end cost of a repeated command, with and without the program cache
+def benchmark_compile(count=2000, repeat=3):
+    commands = [generate_source(200, seed) for seed in range(20)]
+    for name, cache in (('uncached', None), ('cached', ProgramCache())):
+        elapsed = best_time(lambda: [compile(commands[i % len(commands)], cache) for i in range(count)], repeat)
+        print(f'compile {name:20} {count:>9} commands {elapsed * 1000:9.1f} ms  {elapsed / count * 1_000_000:7.1f} us/command')
+
+# Execution time of a loop over constant expressions and branches, with and without the optimizer
+def benchmark_optimizer(repeat=3):
+    source = 'var s = 0, for i, 20000: s = s + 2 * 4 - 1, if true and 1 < 2: s = s + 180 / 3 end, void end'
+    for name, optimize in (('unoptimized', False), ('optimized', True)):
+        program = compile(source, None, optimize)
+        elapsed = best_time(lambda: Interpreter().execute(program, Context('benchmark', SymbolTable())), repeat)
+        print(f'optimizer {name:18} {elapsed * 1000:9.1f} ms')
+
+# Memory of live values and memory allocated while running an integer loop
+def benchmark_values(count=100_000):
+    from values import Integer, Float
+    for name, create in (('Integer', Integer), ('Float', Float)):
+        tracemalloc.start()
+        values = [create(n) for n in range(count)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f'values  {name:20} {size / count:9.1f} bytes per live value')
+
+    source = 'var s = 0, for i, 20000: s = s + i % 7 - 3, if s > 3 and true: s = s - 1 end end'
+    program = compile(source, None)
+    tracemalloc.start()
+    elapsed = best_time(lambda: Interpreter().execute(program, Context('benchmark', SymbolTable())), 1)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    elapsed = best_time(lambda: Interpreter().execute(program, Context('benchmark', SymbolTable())), 3)
+    print(f'values  integer loop         {elapsed * 1000:9.1f} ms  {peak / 1000:9.1f} kB peak')
+
+# Cost of a message event in one channel while other guilds define many triggers
+def benchmark_events(counts=(10, 100, 1000), events=200, repeat=3):
+    from shell import Shell
+    from events import Event, EventType
+    async def output(value):
+        pass
+    shell = Shell(output, 'benchmark', 'channel')
+    shell.run_command('trigger on_message(message.content == "ping"): void end')
+    defined = 0
+    for count in counts:
+        for n in range(defined, count):
+            shell.bind(output, f'guild_{n}', 'channel')
+            shell.run_command(f'trigger on_message(message.content == "keyword_{n}"): void end')
+        defined = count
+        shell.bind(output, 'benchmark', 'channel')
+        elapsed = best_time(lambda: [shell.throw_event(Event(EventType.MESSAGE, ('ping', 'author', None))) for _ in range(events)], repeat)
+        print(f'events  {count:>9} other triggers {elapsed / events * 1_000_000:9.1f} us/event')
+
+# Cost of a message event in a channel with many contains(message.content, ...) triggers, by message length
+def benchmark_keywords(counts=(100, 1000, 5000), lengths=(20, 200, 2000), events=100, repeat=3):
+    from shell import Shell
+    from events import Event, EventType
+    async def output(value):
+        pass
+    shell = Shell(output, 'keywords', 'channel')
+    defined = 0
+    for count in counts:
+        for n in range(defined, count):
+            shell.run_command(f'trigger on_message(contains(message.content, "keyword_{n}")): void end')
+        defined = count
+        for length in lengths:
+            text = ('lorem ipsum ' * length)[:length - 10] + ' keyword_7'
+            elapsed = best_time(lambda: [shell.throw_event(Event(EventType.MESSAGE, (text, 'author', None))) for _ in range(events)], repeat)
+            print(f'events  {count:>9} keyword triggers {length:>6} chars {elapsed / events * 1_000_000:9.1f} us/event')
+
+# Cost of a message event in a channel with many triggers whose conditions are false, without keywords to skip them
+def benchmark_guards(counts=(100, 1000), events=20, repeat=3):
+    from shell import Shell
+    from events import Event, EventType
+    async def output(value):
+        pass
+    shell = Shell(output, 'guards', 'channel')
+    defined = 0
+    for count in counts:
+        for n in range(defined, count):
+            shell.run_command(f'trigger on_message(message.author == "author_{n}"): void end')
+        defined = count
+        elapsed = best_time(lambda: [shell.throw_event(Event(EventType.MESSAGE, ('text', 'author', None))) for _ in range(events)], repeat)
+        print(f'events  {count:>9} rejecting triggers {elapsed / events / count * 1_000_000:9.2f} us/trigger')
+
+BENCHMARKS = {
+    'lexer':    benchmark_lexer,
+    'parser':   benchmark_parser,
+    'compile':  benchmark_compile,
+    'optimizer':benchmark_optimizer,
+    'values':   benchmark_values,
+    'events':   benchmark_events,
+    'keywords': benchmark_keywords,
+    'guards':   benchmark_guards,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,120 @@
+import os
+import sys
+import tempfile
+
+from shell  import Shell
+from events import Event, EventType
+
+# Behavior checks of the interpreter, each one runs on the tree interpreter and on the VirtualMachine
+# Run with: python checks.py [name ...], exits with an error code if any check fails
+
+# Runs a command on a new shell, returns its result and the values it wrote
+def run(command, use_vm):
+    output = []
+    async def output_callback(value):
+        output.append(value)
+    shell = Shell(output_callback, 'checks', 'channel')
+    return shell.run_command(command, use_vm), output
+
+# The right operand of and/or is not evaluated once the left operand decides the result
+# Literal left operands are decided by the Optimizer, variables at runtime
+def check_short_circuit():
+    side_effect = 'function evaluated(): write("evaluated"), return true end, '
+    cases = [
+        ('var r = false and evaluated(), write(r)',            ['False']),
+        ('var r = true or evaluated(), write(r)',              ['True']),
+        ('var r = true and evaluated(), write(r)',             ['evaluated', 'True']),
+        ('var r = false or evaluated(), write(r)',             ['evaluated', 'True']),
+        ('if false and evaluated(): write("then") end',        []),
+        ('if true or evaluated(): write("then") end',          ['then']),
+        ('var f = false, var r = f and evaluated(), write(r)',  ['False']),
+        ('var t = true, var r = t or evaluated(), write(r)',    ['True']),
+        ('var t = true, var r = t and evaluated(), write(r)',   ['evaluated', 'True']),
+    ]
+    failures = 0
+    for command, expected in cases:
+        for use_vm in (False, True):
+            result, output = run(side_effect + command, use_vm)
+            if result != 0 or output != expected:
+                print(f'short_circuit {"vm" if use_vm else "tree"}: {command}\n    expected {expected}, got {output} ({result})')
+                failures += 1
+    return failures
+
+# Module bodies write to the context that imports them first, and cant define triggers
+def check_modules():
+    output = []
+    async def output_callback(value):
+        output.append(value)
+    shell = Shell(output_callback, 'checks', 'modules')      # Created first, it loads core.dsl from the working directory
+
+    failures = 0
+    directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as temporary:
+        with open(os.path.join(temporary, 'check_writes.dsl'), 'w') as file:
+            file.write('write("loaded"), var answer = 42')
+        with open(os.path.join(temporary, 'check_triggers.dsl'), 'w') as file:
+            file.write('trigger on_message(true): write("module trigger") end')
+        os.chdir(temporary)
+        try:
+            shell.run_command('import check_writes, write(answer)')
+            if output != ['loaded', '42']:
+                print(f'modules: module writes expected [\'loaded\', \'42\'], got {output}')
+                failures += 1
+
+            output.clear()
+            shell.run_command('import check_triggers')
+            if not (len(output) == 1 and 'triggers can only be defined' in output[0]):
+                print(f'modules: trigger in a module expected an error, got {output}')
+                failures += 1
+
+            output.clear()
+            shell.bind(output_callback, 'checks', 'other')
+            shell.throw_event(Event(EventType.MESSAGE, ('message', 'author', None)))
+            if output:
+                print(f'modules: message in another channel expected no output, got {output}')
+                failures += 1
+        finally:
+            os.chdir(directory)
+    return failures
+
+# Python math errors of the math module are raised as dsl errors
+def check_math_errors():
+    failures = 0
+    for call in ('pow(0, -1)', 'pow(-8, 0.5)', 'sqrt(-1)', 'factorial(-1)'):
+        for use_vm in (False, True):
+            result, output = run(f'import math, write({call})', use_vm)
+            if not (isinstance(result, str) and 'math error' in result):
+                print(f'math_errors {"vm" if use_vm else "tree"}: {call}\n    expected a math error, got {output} ({result!r})')
+                failures += 1
+    return failures
+
+# Trigger keywords stop filtering messages once contains is redefined where the trigger is
+def check_redefined_contains():
+    output = []
+    async def output_callback(value):
+        output.append(value)
+    shell = Shell(output_callback, 'checks', 'contains')
+    shell.run_command('trigger on_message(contains(message.content, "keyword")): write("exact") end')
+    shell.run_command('trigger on_message(contains(message.content, "keyword") and true): write("filtered") end')
+    shell.run_command('function contains(string, substring): return true end')
+    shell.throw_event(Event(EventType.MESSAGE, ('message', 'author', None)))
+    if output != ['exact', 'filtered']:
+        print(f'redefined_contains: expected [\'exact\', \'filtered\'], got {output}')
+        return 1
+    return 0
+
+CHECKS = {
+    'short_circuit':    check_short_circuit,
+    'modules':          check_modules,
+    'math_errors':      check_math_errors,
+    'redefined_contains': check_redefined_contains,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(CHECKS)
+    failures = 0
+    for name in names:
+        failed = CHECKS[name]()
+        print(f'{name:20} {"ok" if not failed else f"{failed} failed"}')
+        failures += failed
+    sys.exit(1 if failures else 0)
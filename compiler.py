@@ -0,0 +1,350 @@
+from dataclasses import dataclass
+
+from nodes  import *
+from values import Integer, Float, String, Boolean, Value, Callable, NULL
+from tokens import TokenType
+
+# OPCODES
+# Each instruction is an (opcode, argument) tuple
+##################################
+LOAD_CONST      = 0     # push argument
+LOAD_NAME       = 1     # push the value of variable (name, node)
+STORE_NAME      = 2     # pop value, assign it to existing variable (name, node), push null
+DEFINE_NAME     = 3     # pop value, define variable (name, access), push null
+POP             = 4     # discard the top of the stack
+BUILD_LIST      = 5     # pop argument values, push a list holding them
+LIST_GET        = 6     # pop index and list, push element (node for errors)
+LIST_SET        = 7     # pop value, index and list, set element, push null
+JUMP            = 8     # jump to argument
+JUMP_IF_NOT_TRUE= 9     # pop condition, jump to argument if it isnt true
+FOR_SETUP       = 10    # define the unresolved loop variable (name)
+FOR_ITER        = 11    # bind the next value of the iterator to ((name, slot), target), on exhaustion jump to target
+MAKE_FUNCTION   = 12    # create function (name, body, args, access, layout) in the current context
+CALL            = 13    # pop (count, node) arguments and a callable, push result
+UNARY_OP        = 14    # pop value, push the result of the operation with op_token
+BINARY_OP       = 15    # pop left and right, push the result of (op_token, node)
+ATTR_GET        = 16    # pop object, push attribute (name, node)
+ATTR_SET        = 17    # pop value and object, set attribute (name, node), push null
+VISIT           = 18    # push the result of the tree walking visit method of node
+RETURN_VALUE    = 19    # pop value, return it to the calling frame
+LOAD_SLOT       = 20    # push the value of resolved variable (slot, depth, name, node)
+STORE_SLOT      = 21    # pop value, assign it to resolved local variable (slot, name, node), push null
+DEFINE_SLOT     = 22    # pop value, store it in local slot (argument), push null
+JUMP_IF_DECIDED = 23    # keep the left operand and jump to (op_token, target) if it decides the logic operation
+LOGIC_OP        = 24    # pop right and left, push the result of (op_token, node)
+GET_ITER        = 25    # pop value, push an iterator over the values a loop takes from it (node for errors)
+GET_RANGE       = 26    # pop step, stop and start, push an iterator over the range (node for errors)
+FOR_END         = 27    # pop the iterator, remove the loop variable (name, slot), push null
+JUMP_UNWIND     = 28    # drop the stack down to (height, target), jump to target
+TAIL_CALL       = 29    # pop (count, node) arguments and a callable, return the result of the call from the current frame
+
+# Change of the stack height after each instruction, BUILD_LIST, CALL and TAIL_CALL depend on their argument
+STACK_EFFECTS = {
+    LOAD_CONST: 1, LOAD_NAME: 1, STORE_NAME: 0, DEFINE_NAME: 0, POP: -1,
+    LIST_GET: -1, LIST_SET: -2, JUMP: 0, JUMP_IF_NOT_TRUE: -1, FOR_SETUP: 0, FOR_ITER: 0, MAKE_FUNCTION: 1,
+    UNARY_OP: 0, BINARY_OP: -1, ATTR_GET: 0, ATTR_SET: -1, VISIT: 1, RETURN_VALUE: -1, LOAD_SLOT: 1,
+    STORE_SLOT: 0, DEFINE_SLOT: 0, JUMP_IF_DECIDED: 0, LOGIC_OP: -1, GET_ITER: 0, GET_RANGE: -2, FOR_END: 0,
+    JUMP_UNWIND: 0,
+}
+##################################
+
+
+# Instruction stream of a compiled node
+@dataclass
+class Code:
+    instructions: list
+
+    def __repr__(self):
+        return '\n'.join(f'{i} {instruction}' for i, instruction in enumerate(self.instructions))
+
+# Jump targets of the loop being compiled
+#   height:     stack height while its body runs, break and continue drop the stack down to it
+#   start:      instruction continue jumps to
+#   breaks:     break jumps, patched to the end of the loop
+class Loop:
+
+    def __init__(self, height, start):
+        self.height = height
+        self.start = start
+        self.breaks = []
+
+# Translates an abstract syntax tree into a flat instruction stream for the VirtualMachine
+# Each compile method leaves exactly one value on the stack, the same value its visit method returns
+# Nodes without a compile method are delegated back to the tree walking Interpreter
+class Compiler:
+
+    def __init__(self):
+        self.instructions = []
+        self.height = 0         # Stack height after the last emitted instruction
+        self.loops = []
+
+    # Compiler entry point, returns the Code of the given node
+    def compile(self, node):
+        self.compile_node(node)
+        self.emit(RETURN_VALUE)
+        return Code(self.instructions)
+
+    def compile_node(self, node):
+        method = getattr(self, f'compile_{type(node).__name__}', self.compile_generic)
+        method(node)
+
+    # Appends an instruction and returns its index
+    def emit(self, opcode, argument = None):
+        self.instructions.append((opcode, argument))
+        if opcode == BUILD_LIST:
+            self.height += 1 - argument
+        elif opcode == CALL:
+            self.height -= argument[0]
+        elif opcode == TAIL_CALL:
+            self.height -= argument[0] + 1
+        else:
+            self.height += STACK_EFFECTS[opcode]
+        return len(self.instructions) - 1
+
+    # Points an already emitted jump to the next instruction
+    def patch(self, index, argument = None):
+        opcode = self.instructions[index][0]
+        target = len(self.instructions)
+        self.instructions[index] = (opcode, target if argument is None else (argument, target))
+
+    def compile_generic(self, node):
+        self.emit(VISIT, node)
+
+    # VALUES
+    ##################################
+    def compile_NoneType(self, node):
+        self.emit(LOAD_CONST, NULL)
+
+    def compile_IntegerNode(self, node: IntegerNode):
+        self.emit(LOAD_CONST, Integer.of(node.value))
+
+    def compile_FloatNode(self, node: FloatNode):
+        self.emit(LOAD_CONST, Float(node.value))
+
+    def compile_StringNode(self, node: StringNode):
+        self.emit(LOAD_CONST, String(node.value))
+
+    def compile_BooleanNode(self, node: BooleanNode):
+        self.emit(LOAD_CONST, Boolean.of(node.value))
+
+    def compile_VoidNode(self, node: VoidNode):
+        self.emit(LOAD_CONST, NULL)
+    ##################################
+
+    # VARIABLES
+    ##################################
+    def compile_VarAccessNode(self, node: VarAccessNode):
+        if node.slot is not None:
+            self.emit(LOAD_SLOT, (node.slot, node.depth, node.var_name_token.value, node))
+        else:
+            self.emit(LOAD_NAME, (node.var_name_token.value, node))
+
+    def compile_VarAssingNode(self, node: VarAssingNode):
+        if isinstance(node.value_node, Value):
+            self.emit(LOAD_CONST, node.value_node)
+        else:
+            self.compile_node(node.value_node)
+        if node.slot is not None:
+            self.emit(STORE_SLOT, (node.slot, node.var_name_token.value, node))
+        else:
+            self.emit(STORE_NAME, (node.var_name_token.value, node))
+
+    def compile_VarDefNode(self, node: VarDefNode):
+        if node.value_node:
+            if isinstance(node.value_node, Callable):
+                self.emit(LOAD_CONST, node.value_node)
+            else:
+                self.compile_node(node.value_node)
+        else:
+            self.emit(LOAD_CONST, NULL)
+        if node.slot is not None:
+            self.emit(DEFINE_SLOT, node.slot)
+        else:
+            self.emit(DEFINE_NAME, (node.var_name_token.value, node.access))
+    ##################################
+
+    # ATTRIBUTES
+    ##################################
+    def compile_AttributeAccessNode(self, node: AttributeAccessNode):
+        if isinstance(node.attribute_node, AttributeAccessNode):
+            return self.compile_generic(node)
+        self.compile_node(node.object_value)
+        self.emit(ATTR_GET, (node.attribute_node.var_name_token.value, node))
+
+    def compile_AttributeAssingNode(self, node: AttributeAssingNode):
+        self.compile_node(node.object_value)
+        self.compile_node(node.value_node)
+        self.emit(ATTR_SET, (node.attribute_node.var_name_token.value, node))
+    ##################################
+
+    # LISTS
+    ##################################
+    def compile_ListNode(self, node: ListNode):
+        for element_node in node.element_nodes:
+            self.compile_node(element_node)
+        self.emit(BUILD_LIST, len(node.element_nodes))
+
+    def compile_ListAccessNode(self, node: ListAccessNode):
+        self.compile_node(node.list_node)
+        self.compile_node(node.index_node)
+        self.emit(LIST_GET, node)
+
+    def compile_ListAssingNode(self, node: ListAssingNode):
+        self.compile_node(node.list_node)
+        self.compile_node(node.index_node)
+        self.compile_node(node.value_node)
+        self.emit(LIST_SET, node)
+    ##################################
+
+    # STATMENTS
+    ##################################
+    # A statment evaluates to null, return leaves the function right away
+    def compile_StatmentNode(self, node: StatmentNode):
+        for element_node in node.element_nodes:
+            self.compile_node(element_node)
+            self.emit(POP)
+        self.emit(LOAD_CONST, NULL)
+
+    # The null after the return is never reached, it keeps the stack height of the code that follows
+    # Returning a call is a tail call, the called function takes over the frame
+    def compile_ReturnNode(self, node: ReturnNode):
+        if type(node.value_node) is CallNode:
+            self.compile_node(node.value_node.func_node)
+            for arg_node in node.value_node.arg_nodes:
+                self.compile_node(arg_node)
+            self.emit(TAIL_CALL, (len(node.value_node.arg_nodes), node.value_node))
+        else:
+            self.compile_node(node.value_node)
+            self.emit(RETURN_VALUE)
+        self.emit(LOAD_CONST, NULL)
+
+    def compile_IfNode(self, node: IfNode):
+        self.compile_node(node.condition)
+        jump_else = self.emit(JUMP_IF_NOT_TRUE)
+        self.compile_node(node.if_case)
+        self.emit(POP)
+
+        if node.else_case:
+            jump_end = self.emit(JUMP)
+            self.patch(jump_else)
+            self.compile_node(node.else_case)
+            self.emit(POP)
+            self.patch(jump_end)
+        else:
+            self.patch(jump_else)
+
+        self.emit(LOAD_CONST, NULL)
+
+    ##################################
+
+    # LOOPS
+    # The iterator of a for loop stays on the stack while the loop runs, FOR_END removes it
+    # break and continue drop whatever their statments left on the stack and jump out of or back to the loop
+    ##################################
+    def compile_ForNode(self, node: ForNode):
+        self.compile_node(node.steps)
+        self.emit(GET_ITER, node)
+        self.compile_loop(node)
+
+    def compile_ForInNode(self, node: ForInNode):
+        self.compile_node(node.iterable)
+        if node.stop is None:
+            self.emit(GET_ITER, node)
+        else:
+            self.compile_node(node.stop)
+            if node.step is None:
+                self.emit(LOAD_CONST, Integer.of(1))
+            else:
+                self.compile_node(node.step)
+            self.emit(GET_RANGE, node)
+        self.compile_loop(node)
+
+    # Compiles the body of a for loop, with the iterator already on the stack
+    def compile_loop(self, node):
+        binding = (node.identifier.value if node.identifier is not None else None, node.slot)
+        if node.slot is None and node.identifier is not None:
+            self.emit(FOR_SETUP, node.identifier.value)
+
+        loop = Loop(self.height, len(self.instructions))
+        self.loops.append(loop)
+        self.emit(FOR_ITER)
+        self.compile_node(node.body_node)
+        self.emit(POP)
+        self.emit(JUMP, loop.start)
+        self.loops.pop()
+
+        self.patch(loop.start, binding)
+        for jump in loop.breaks:
+            self.patch(jump, loop.height)
+        self.emit(FOR_END, binding)
+
+    def compile_WhileNode(self, node: WhileNode):
+        loop = Loop(self.height, len(self.instructions))
+        self.loops.append(loop)
+        self.compile_node(node.condition)
+        jump_end = self.emit(JUMP_IF_NOT_TRUE)
+        self.compile_node(node.body_node)
+        self.emit(POP)
+        self.emit(JUMP, loop.start)
+        self.loops.pop()
+
+        self.patch(jump_end)
+        for jump in loop.breaks:
+            self.patch(jump, loop.height)
+        self.emit(LOAD_CONST, NULL)
+
+    # The null after the jump is never reached, it keeps the stack height of the code that follows
+    def compile_BreakNode(self, node: BreakNode):
+        if not self.loops:
+            return self.compile_generic(node)       # Loop run by the tree walking Interpreter
+        loop = self.loops[-1]
+        loop.breaks.append(self.emit(JUMP_UNWIND))
+        self.emit(LOAD_CONST, NULL)
+
+    def compile_ContinueNode(self, node: ContinueNode):
+        if not self.loops:
+            return self.compile_generic(node)
+        loop = self.loops[-1]
+        self.emit(JUMP_UNWIND, (loop.height, loop.start))
+        self.emit(LOAD_CONST, NULL)
+    ##################################
+
+    # FUNCTIONS
+    ##################################
+    def compile_FuncDefNode(self, node: FuncDefNode):
+        func_name = node.func_name_token.value if node.func_name_token else None
+
+        args = []
+        for name_token, type_token in zip(node.arg_name_tokens, node.arg_type_tokens):
+            args.append((name_token.value, type_token.value if type_token else None))
+
+        self.emit(MAKE_FUNCTION, (func_name, node.body_node, args, node.access, node.layout))
+
+    def compile_CallNode(self, node: CallNode):
+        self.compile_node(node.func_node)
+        for arg_node in node.arg_nodes:
+            self.compile_node(arg_node)
+        self.emit(CALL, (len(node.arg_nodes), node))
+    ##################################
+
+    # OPERATIONS
+    ##################################
+    def compile_UnaryOpNode(self, node: UnaryOpNode):
+        self.compile_node(node.node)
+        self.emit(UNARY_OP, node.op_token)
+
+    # The right operand is evaluated first, as visit_BinOpNode does
+    # Logic operations evaluate the left operand first and jump over the right one when the left decides the result
+    def compile_BinOpNode(self, node: BinOpNode):
+        if node.op_token.type == TokenType.KEYWORD:
+            self.compile_node(node.left_node)
+            jump_end = self.emit(JUMP_IF_DECIDED)
+            self.compile_node(node.right_node)
+            self.emit(LOGIC_OP, (node.op_token, node))
+            self.patch(jump_end, node.op_token)
+            return
+
+        self.compile_node(node.right_node)
+        self.compile_node(node.left_node)
+        self.emit(BINARY_OP, (node.op_token, node))
+    ##################################
@@ -50,12 +50,22 @@ class SymbolTable:
     def define(self, name, value, access=AccessType.PUBLIC):
         self.symbols[name] = Variable(value, access)
 
+    # Shares the public values of another table, without copying them
+    # Each table gets its own bindings, assigning a name in one table doesnt change it in the other
+    def share(self, symbol_table):
+        for name, variable in symbol_table.symbols.items():
+            if variable.access == AccessType.PUBLIC:
+                self.symbols[name] = Variable(variable.value, variable.access)
+
     def remove(self, name):
         if name in self.symbols:
             del self.symbols[name]
     
     def exists(self, name):
         return name in self.symbols
+
+    def clear(self):
+        self.symbols = {}
         
     def __repr__(self):
         table = ''
@@ -66,7 +76,87 @@ class SymbolTable:
             table += f'<-{variable.value}'
         return f'{table}'
 
+# Local variable names of a function, in slot order
+# Shared by every frame of the function, built once by the Resolver
+class FrameLayout:
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f'<layout {", ".join(self.names)}>'
+
+# Symbol table of a function call, its local variables are stored in a list indexed by slot
+# Resolved variable nodes read the slots directly, names outside the layout are kept in the symbols dictionary
+# An empty slot holds None, lookups then continue by name as in any other table
+class Frame(SymbolTable):
+
+    def __init__(self, layout: FrameLayout, parent = None):
+        super().__init__(parent)
+        self.layout = layout
+        self.slots = [None] * len(layout)
+
+    def get(self, name):
+        index = self.layout.index.get(name)
+        if index is not None and self.slots[index] is not None:
+            return self.slots[index]
+        return super().get(name)
+
+    def get_local(self, name):
+        index = self.layout.index.get(name)
+        if index is not None and self.slots[index] is not None:
+            return self.slots[index]
+        return super().get_local(name)
+
+    def get_access(self, name):
+        index = self.layout.index.get(name)
+        if index is not None and self.slots[index] is not None:
+            return AccessType.PUBLIC
+        return super().get_access(name)
+
+    def set(self, name, value):
+        index = self.layout.index.get(name)
+        if index is not None and self.slots[index] is not None:
+            self.slots[index] = value
+        else:
+            super().set(name, value)
+
+    def define(self, name, value, access=AccessType.PUBLIC):
+        index = self.layout.index.get(name)
+        if index is not None:
+            self.slots[index] = value
+        else:
+            super().define(name, value, access)
+
+    def remove(self, name):
+        index = self.layout.index.get(name)
+        if index is not None:
+            self.slots[index] = None
+        super().remove(name)
+
+    def exists(self, name):
+        index = self.layout.index.get(name)
+        if index is not None and self.slots[index] is not None:
+            return True
+        return super().exists(name)
+
+    def clear(self):
+        self.slots = [None] * len(self.layout)
+        super().clear()
+
+    def __repr__(self):
+        table = ''
+        for name, value in zip(self.layout.names, self.slots):
+            if value is not None:
+                table += f'{name}<-{value}'
+        return table + super().__repr__()
+
 # Holds a context name, symbol table and parent if any
+# The ancestors of a context are computed once on creation, the parent of a context never changes
 @dataclass
 class Context:
     display_name: str
@@ -79,6 +169,15 @@ class Context:
         self.symbol_table = symbol_table
         self.parent = parent
         self.output = output
+        self.triggers = None        # Trigger groups by event type of a shell, guild or channel context, see TriggerRegistry
+
+        # Ancestors from the root down to the parent, indexed by their depth
+        if parent is None:
+            self.depth = 0
+            self.ancestors = ()
+        else:
+            self.depth = parent.depth + 1
+            self.ancestors = parent.ancestors + (parent,)
 
     # Sends an asyncronous callback with the output value
     def send_output(self, value):
@@ -92,21 +191,24 @@ class Context:
         elif self.parent:
             self.parent.send_output(value)
 
+    # Returns the output callback of the context or of its closest ancestor with one, None if there is none
+    def get_output(self):
+        for context in self.get_hierarchy():
+            if context.output:
+                return context.output
+        return None
+
     # Returns the root context of the context hierarchy
     def get_root_context(self):
-        if self.parent:
-            return self.parent.get_root_context()
-        else:
-            return self
+        return self.ancestors[0] if self.ancestors else self
 
-    # Returns the context hierarchy
+    # Returns the context hierarchy, from this context up to the root
     def get_hierarchy(self):
-        hierarchy = []
-        context = self
-        while context is not None:
-            hierarchy.append(context)
-            context = context.parent
-        return hierarchy
+        return [self, *reversed(self.ancestors)]
+
+    # Checks if this context is the given context or one of its descendants
+    def is_inside(self, context):
+        return context is self or (context.depth < self.depth and self.ancestors[context.depth] is context)
 
     def copy(self):
         return Context(self.display_name, self.symbol_table, self.parent, self.output)
@@ -27,3 +27,7 @@ class ZeroDivisionErrorDsl(Error):
 class IndexErrorDsl(Error):
     def __init__(self, details, position):
         super().__init__('IndexError', details, position)
+
+class RecursionErrorDsl(Error):
+    def __init__(self, details, position):
+        super().__init__('RecursionError', details, position)
@@ -1,6 +1,9 @@
 from enum import Enum
 from dataclasses import dataclass
 
+from nodes import BinOpNode, CallNode, AttributeAccessNode, VarAccessNode, StringNode
+from tokens import TokenType
+
 class EventType(Enum):
 
     MESSAGE         = 0
@@ -15,3 +18,206 @@ class Event():
 
     def __repr__(self):
         return f'{self.type.name} EVENT'
+
+# TRIGGER PREFILTER
+# The keywords of a message trigger are literals the message content must contain for its condition to be true
+# They are taken from contains(message.content, "...") and message.content == "..." checks of the condition
+# A condition without keywords, or that can be true without them, is evaluated on every message
+##################################
+
+# Returns the keywords of a condition, any of them must be in the message content for it to be true
+# Returns None if the condition may be true without any of them
+def condition_keywords(node):
+    if type(node) is CallNode:
+        if is_variable(node.func_node, 'contains') and len(node.arg_nodes) == 2 and is_content(node.arg_nodes[0]):
+            return literal_keywords(node.arg_nodes[1])
+        return None
+
+    if type(node) is BinOpNode:
+        if node.op_token.type == TokenType.DOUBLE_EQUALS:
+            if is_content(node.left_node):
+                return literal_keywords(node.right_node)
+            if is_content(node.right_node):
+                return literal_keywords(node.left_node)
+            return None
+
+        if node.op_token.matches(TokenType.KEYWORD, 'and'):
+            left = condition_keywords(node.left_node)
+            return left if left is not None else condition_keywords(node.right_node)
+
+        if node.op_token.matches(TokenType.KEYWORD, 'or'):
+            left = condition_keywords(node.left_node)
+            right = condition_keywords(node.right_node) if left is not None else None
+            return left | right if right is not None else None
+
+    return None
+
+# Checks if a condition is true exactly when one of its keywords is in the message content
+# Only contains checks and or of them, an equality needs the whole content to match
+def keywords_decide(node):
+    if type(node) is CallNode:
+        return condition_keywords(node) is not None
+    if type(node) is BinOpNode and node.op_token.matches(TokenType.KEYWORD, 'or'):
+        return keywords_decide(node.left_node) and keywords_decide(node.right_node)
+    return False
+
+def literal_keywords(node):
+    if type(node) is StringNode and node.value:
+        return frozenset((node.value,))
+    return None             # An empty string is in every message
+
+def is_variable(node, name):
+    return type(node) is VarAccessNode and node.var_name_token.value == name
+
+def is_content(node):
+    return type(node) is AttributeAccessNode and is_variable(node.object_value, 'message') and is_variable(node.attribute_node, 'content')
+
+# Aho-Corasick automaton over the keywords of a group of triggers
+# A single pass over a text finds every keyword in it, whatever the number of keywords
+class KeywordAutomaton:
+
+    def __init__(self, keywords):
+        self.transitions = [{}]     # State -> character -> next state
+        self.fail = [0]             # State -> state of its longest proper suffix
+        self.outputs = [()]         # State -> values of the keywords that end in it
+
+        ends = {}
+        for keyword, value in keywords:
+            state = 0
+            for character in keyword:
+                next_state = self.transitions[state].get(character)
+                if next_state is None:
+                    next_state = len(self.transitions)
+                    self.transitions[state][character] = next_state
+                    self.transitions.append({})
+                    self.fail.append(0)
+                    self.outputs.append(())
+                state = next_state
+            ends.setdefault(state, []).append(value)
+        for state, values in ends.items():
+            self.outputs[state] = tuple(values)
+
+        # Breadth first, the fail state of each state is set before its children
+        queue = list(self.transitions[0].values())
+        for state in queue:
+            for character, next_state in self.transitions[state].items():
+                fail = self.fail[state]
+                while fail and character not in self.transitions[fail]:
+                    fail = self.fail[fail]
+                fail = self.transitions[fail].get(character, 0)
+                self.fail[next_state] = fail
+                self.outputs[next_state] += self.outputs[fail]
+                queue.append(next_state)
+
+    # Returns the set of values of the keywords found in the text
+    def search(self, text):
+        transitions = self.transitions
+        fail = self.fail
+        outputs = self.outputs
+        found = set()
+        state = 0
+        for character in text:
+            while state and character not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(character, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+##################################
+
+
+# TRIGGER REGISTRY
+# Triggers indexed by event type and by the context that owns them
+# The owner of a trigger is the closest scope in the hierarchy of the context it was defined in
+# Scopes are the shell, guild and channel contexts, registered by the shell as they are created
+# Each scope holds its own trigger groups, so they are dropped along with it
+# Contexts outside any scope, as those of modules, cant own triggers
+##################################
+
+# Triggers of an event type owned by the same context
+# Triggers with keywords are only candidates for the texts that contain one of them
+class TriggerGroup:
+
+    def __init__(self):
+        self.triggers = []
+        self.unfiltered = []
+        self.automaton = None       # Built on the first search after a trigger with keywords is added
+
+    def add(self, trigger):
+        self.triggers.append(trigger)
+        if trigger.keywords is None:
+            self.unfiltered.append(trigger)
+        else:
+            self.automaton = None
+
+    # Returns the triggers that may run for the text, in definition order, all of them if the text is None
+    def matching(self, text):
+        if text is None or len(self.unfiltered) == len(self.triggers):
+            return self.triggers
+
+        if self.automaton is None:
+            keywords = [(keyword, i) for i, trigger in enumerate(self.triggers) if trigger.keywords is not None for keyword in trigger.keywords]
+            self.automaton = KeywordAutomaton(keywords)
+
+        found = self.automaton.search(text)
+        if not found:
+            return self.unfiltered
+        return sorted(self.unfiltered + [self.triggers[i] for i in found], key=lambda trigger: trigger.order)
+
+# Keywords of triggers only hold while contains is the built in function
+# so messages are only prefiltered for the scopes where contains still resolves to it
+class TriggerRegistry:
+
+    def __init__(self, contains = None):
+        self.contains = contains        # Built in contains function the keywords assume
+        self.count = 0
+
+    def add_scope(self, context):
+        if context.triggers is None:
+            context.triggers = {}
+
+    # Returns the closest scope of a context, None if it isnt inside any
+    def owner(self, context):
+        for ancestor in context.get_hierarchy():
+            if ancestor.triggers is not None:
+                return ancestor
+        return None
+
+    def add(self, trigger):
+        owner = self.owner(trigger.trigger_context)
+        if owner is None:
+            raise ValueError(f'{trigger.trigger_context} is not inside a shell, guild or channel context')
+        trigger.order = self.count
+        self.count += 1
+        if trigger.event not in owner.triggers:
+            owner.triggers[trigger.event] = TriggerGroup()
+        owner.triggers[trigger.event].add(trigger)
+
+    # Returns the triggers of the event type that an event from the context reaches, in definition order
+    # Only the triggers owned by the context hierarchy are visited
+    # With the text of a message, triggers whose keywords arent in it are left out, unless contains was redefined
+    def matching(self, event_type, context, text = None):
+        lists = []
+        for ancestor in context.get_hierarchy():
+            if ancestor.triggers and event_type in ancestor.triggers:
+                prefilter = text is not None and ancestor.symbol_table.get('contains') is self.contains
+                triggers = ancestor.triggers[event_type].matching(text if prefilter else None)
+                if triggers:
+                    lists.append(triggers)
+
+        if len(lists) == 1:
+            return list(lists[0])
+        return sorted((trigger for triggers in lists for trigger in triggers), key=lambda trigger: trigger.order)
+
+    # Returns the triggers of every event type that events from the context reach
+    def visible(self, context):
+        event_types = {event_type for ancestor in context.get_hierarchy() if ancestor.triggers for event_type in ancestor.triggers}
+        triggers = [trigger for event_type in event_types for trigger in self.matching(event_type, context)]
+        return sorted(triggers, key=lambda trigger: trigger.order)
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f'<trigger registry of {self.count} triggers>'
+##################################
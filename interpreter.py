@@ -6,10 +6,20 @@ from context    import Context
 from tokens     import TokenType
 
 from lexer      import Lexer
-from parser_    import Parser
+from program    import Program, compile, load, read_source
+from modules    import modules
+from events     import condition_keywords, keywords_decide
+from operations import find_operation, generic_operation, operator_key
 
 from errors     import Error
-from errors     import TypeErrorDsl, IndexErrorDsl
+from errors     import TypeErrorDsl, IndexErrorDsl, RecursionErrorDsl
+
+# Raised by break and continue statments, caught by the loop they are in
+class BreakLoop(Exception):
+    pass
+
+class ContinueLoop(Exception):
+    pass
 
 class Interpreter:
 
@@ -22,10 +32,10 @@ class Interpreter:
         return method(node, context)
 
     def visit_NoneType(self, node, context: Context):
-        return Null()         # A visit to this node probably means something went wrong
+        return NULL         # A visit to this node probably means something went wrong
 
     def visit_IntegerNode(self, node: IntegerNode, context: Context):
-        return Integer(node.value)
+        return Integer.of(node.value)
 
     def visit_FloatNode(self, node: FloatNode, context: Context):
         return Float(node.value)
@@ -34,10 +44,10 @@ class Interpreter:
         return String(node.value)
 
     def visit_BooleanNode(self, node: BooleanNode, context: Context):
-        return Boolean(node.value)
+        return Boolean.of(node.value)
 
     def visit_VoidNode(self, node: VoidNode, context: Context):
-        return Null()
+        return NULL
 
     def visit_AttributeAssingNode(self, node: AttributeAssingNode, context: Context):
         object_value = self.visit(node.object_value, context)
@@ -49,9 +59,9 @@ class Interpreter:
 
         value = self.visit(node.value_node, context)
 
-        object_value.set(var_name, value, context)
+        object_value.set(var_name, value, context, self.attribute_cache(node))
 
-        return Null()
+        return NULL
 
     def visit_AttributeAccessNode(self, node: AttributeAccessNode, context: Context):
         object_value = self.visit(node.object_value, context)
@@ -64,17 +74,35 @@ class Interpreter:
         else:
             var_name = node.attribute_node.var_name_token.value
 
-        attribute_value = object_value.get(var_name, context)
+        attribute_value = object_value.get(var_name, context, self.attribute_cache(node))
 
         if attribute_value == None:
             raise TypeErrorDsl(f'{node.attribute_node} is not defined', node.position)
 
         return attribute_value
 
+    # Returns the inline cache of an attribute node, created on its first access
+    def attribute_cache(self, node: AttributeAccessNode):
+        if node.cache is None:
+            node.cache = AttributeCache()
+        return node.cache
+
+    # Resolved variables are read from their frame slot, empty slots and unresolved variables by name
     def visit_VarAccessNode(self, node: VarAccessNode, context: Context):
         var_name = node.var_name_token.value
 
-        value = context.symbol_table.get(var_name)
+        table = context.symbol_table
+        slot = node.slot
+        if slot is not None:
+            depth = node.depth
+            while depth:
+                table = table.parent
+                depth -= 1
+            value = table.slots[slot]
+            if value is not None:
+                return value
+
+        value = table.get(var_name)
         if value:
             return value
         else:
@@ -83,24 +111,32 @@ class Interpreter:
     def visit_VarAssingNode(self, node: VarAssingNode, context: Context):
         var_name = node.var_name_token.value
 
-        if not context.symbol_table.exists(var_name):
-            raise TypeErrorDsl(f'{var_name} is not defined', None, node.position)
+        table = context.symbol_table
+        if node.slot is not None and table.slots[node.slot] is not None:
+            table.slots[node.slot] = self.visit(node.value_node, context) if not isinstance(node.value_node, Value) else node.value_node
+            return NULL
+
+        if not table.exists(var_name):
+            raise TypeErrorDsl(f'{var_name} is not defined', node.position)
         
         value = self.visit(node.value_node, context) if not isinstance(node.value_node, Value) else node.value_node
         context.symbol_table.set(var_name, value)
 
-        return Null()
+        return NULL
 
     def visit_VarDefNode(self, node: VarDefNode, context: Context):
         var_name = node.var_name_token.value
         if node.value_node:
             value = self.visit(node.value_node, context) if not isinstance(node.value_node, Callable) else node.value_node
         else:
-            value = Null()
+            value = NULL
 
-        context.symbol_table.define(var_name, value, node.access)
+        if node.slot is not None:
+            context.symbol_table.slots[node.slot] = value
+        else:
+            context.symbol_table.define(var_name, value, node.access)
 
-        return Null()
+        return NULL
 
     def visit_ListNode(self, node: ListNode, context: Context):
         elements = []
@@ -110,23 +146,20 @@ class Interpreter:
         
         return List(elements)
 
+    # A statment evaluates to null, return leaves the function right away
     def visit_StatmentNode(self, node: StatmentNode, context: Context):
-        return_value = None
-
         for element_node in node.element_nodes:
-            value = self.visit(element_node, context)
-            if isinstance(element_node, ReturnNode):
-                return_value = value
-
-        return return_value if return_value else Null()
+            self.visit(element_node, context)
+        return NULL
 
     def visit_ImportNode(self, node: ImportNode, context: Context):
         value = node.value
         self.import_file(value, context)
-        return Null()
+        return NULL
 
+    # Raises the value up to the function call, through any statment, if or loop in between
     def visit_ReturnNode(self, node: ReturnNode, context: Context):
-        return self.visit(node.value_node, context)
+        raise FunctionReturn(self.visit(node.value_node, context))
 
     def visit_ListAccessNode(self, node: ListAccessNode, context: Context):
         list_var: List = self.visit(node.list_node, context)
@@ -139,17 +172,17 @@ class Interpreter:
     def visit_ListAssingNode(self, node: ListAssingNode, context: Context):
         list_var = self.visit(node.list_node, context)
         index = self.visit(node.index_node, context)
-        if index.value > list_var.getLenght():
+        if index.value > list_var.get_lenght():
             raise IndexErrorDsl(f'index out of range', node.position)
 
         value = self.visit(node.value_node, context)
         
-        list_var.setElement(index.value, value)
-        return Null()
+        list_var.set_element(index.value, value)
+        return NULL
 
     def visit_IfNode(self, node: IfNode, context: Context):
         condition_value = self.visit(node.condition, context)
-        if condition_value == Boolean(True):
+        if condition_value is TRUE:
             if_case_value = self.visit(node.if_case, context)
             # return if_case_value
         elif node.else_case:
@@ -158,21 +191,101 @@ class Interpreter:
         else:
             pass
 
-        return Null()
+        return NULL
 
+    # LOOPS
+    # break and continue raise BreakLoop and ContinueLoop, caught by the loop around them
+    # The parser only accepts them inside a loop of the same function, so they never leave a call
+    #######################################
     def visit_ForNode(self, node: ForNode, context: Context):
-        steps = node.steps
-        identifier = node.identifier
-        body_node = node.body_node
+        steps = self.visit(node.steps, context)
+        return self.run_loop(node, self.iterate(steps, node), context)
+
+    def visit_ForInNode(self, node: ForInNode, context: Context):
+        iterable = self.visit(node.iterable, context)
+        if node.stop is None:
+            return self.run_loop(node, self.iterate(iterable, node), context)
 
-        index = Integer(0)
-        context.symbol_table.define(identifier.value, index)
-        for i in range(self.visit(steps, context).value):
-            index.value = i
-            self.visit(body_node, context)
-        context.symbol_table.remove(identifier.value)
+        stop = self.visit(node.stop, context)
+        step = self.visit(node.step, context) if node.step is not None else Integer.of(1)
+        return self.run_loop(node, self.iterate_range(iterable, stop, step, node), context)
 
-        return Null()
+    # Runs the body of the loop once per value, the loop variable only exists while the loop runs
+    # Resolved loop variables are written to their frame slot, others are defined in the table by name
+    def run_loop(self, node, values, context: Context):
+        body_node = node.body_node
+        table = context.symbol_table
+        slot = node.slot
+
+        if slot is not None:
+            slots = table.slots
+            for value in values:
+                slots[slot] = value
+                try:
+                    self.visit(body_node, context)
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    pass
+            slots[slot] = None
+            return NULL
+
+        name = node.identifier.value if node.identifier is not None else None
+        if name is not None:
+            table.define(name, NULL)
+        for value in values:
+            if name is not None:
+                table.set(name, value)
+            try:
+                self.visit(body_node, context)
+            except BreakLoop:
+                break
+            except ContinueLoop:
+                pass
+        if name is not None:
+            table.remove(name)
+        return NULL
+
+    def visit_WhileNode(self, node: WhileNode, context: Context):
+        condition = node.condition
+        body_node = node.body_node
+
+        while self.visit(condition, context) is TRUE:
+            try:
+                self.visit(body_node, context)
+            except BreakLoop:
+                break
+            except ContinueLoop:
+                pass
+        return NULL
+
+    def visit_BreakNode(self, node: BreakNode, context: Context):
+        raise BreakLoop()
+
+    def visit_ContinueNode(self, node: ContinueNode, context: Context):
+        raise ContinueLoop()
+
+    # Returns an iterator over the values a loop takes from a value
+    #   int: 0 up to the int, list: its elements, array: its numbers, str: its characters
+    def iterate(self, value, node):
+        value_type = type(value)
+        if value_type is Integer:
+            return map(Integer.of, range(value.value))
+        if value_type is List:
+            return iter(value.value)
+        if value_type is Array:
+            return map(value.wrap_element, value.value)
+        if value_type is String:
+            return map(String, value.value)
+        raise TypeErrorDsl(f'{value.type() if isinstance(value, Value) else value} is not iterable', node.position)
+
+    def iterate_range(self, start, stop, step, node):
+        if type(start) is not Integer or type(stop) is not Integer or type(step) is not Integer:
+            raise TypeErrorDsl('range start, stop and step must be int', node.position)
+        if step.value == 0:
+            raise TypeErrorDsl('range step cant be zero', node.position)
+        return map(Integer.of, range(start.value, stop.value, step.value))
+    #######################################
 
     def visit_FuncDefNode(self, node: FuncDefNode, context: Context):
         func_name = node.func_name_token.value if node.func_name_token else None
@@ -185,15 +298,19 @@ class Interpreter:
         for i in range(len(arg_names)):
             args.append((arg_names[i], arg_types[i]))
 
-        function = Function(func_name, body_node, args, context)
+        function = Function(func_name, body_node, args, context, node.layout)
 
         if node.func_name_token:
             return self.visit(VarDefNode(node.position, node.func_name_token, value_node=function, access=node.access), context)
         else:
             return function
 
+    # The condition of the trigger becomes its guard, the body is only called when the guard passes
     def visit_TriggerDefNode(self, node: TriggerDefNode, context: Context):
-        trigger_list = context.get_root_context().symbol_table.parent.symbols.get('@triggers')
+        root = context.get_root_context()
+        registry = (root.symbol_table.parent or root.symbol_table).get('@triggers')
+        if registry.owner(context) is None:
+            raise TypeErrorDsl('triggers can only be defined in a shell, guild or channel, not in modules', node.position)
 
         event = self.visit(node.event, context)
 
@@ -207,12 +324,26 @@ class Interpreter:
         else:
             pass
 
-        function = Function('@trigger_function', node.body_node, args)
-
-        trigger = Trigger(event, function, context)
-        trigger_list.value.append_element(trigger)
-
-        return Null()
+        body_node = node.body_node
+        guard = None
+        keywords = None
+        if type(body_node) is IfNode:
+            condition = body_node.condition
+            exact = False
+            # Only triggers defined in their owner context get keywords, a context in between could define its own contains
+            # The registry checks on each event that contains is still the built in function for the owner
+            if event == EventType.MESSAGE and registry.owner(context) is context:
+                keywords = condition_keywords(condition)
+                exact = keywords_decide(condition)
+            guard = Guard(condition, args, context, node.layout, exact)
+            body_node = body_node.if_case
+
+        function = Function('@trigger_function', body_node, args, layout=node.layout)
+
+        trigger = Trigger(event, function, context, keywords, guard)
+        registry.add(trigger)
+
+        return NULL
 
     def visit_ClassDefNode(self, node: ClassDefNode, context: Context):
         class_name = node.class_name_token.value if node.class_name_token else None
@@ -239,90 +370,86 @@ class Interpreter:
         return result
 
     def visit_UnaryOpNode(self, node: UnaryOpNode, context: Context):
-        if node.op_token.type == TokenType.MINUS:
-            result = - self.visit(node.node, context).value
-            return Integer(result) if type(result) == int else Float(result)
-        if node.op_token.matches(TokenType.KEYWORD, 'not'):
-            result = not self.visit(node.node, context).value
-            return Boolean(result)
+        value = self.visit(node.node, context)
+        return self.unary_operation(node.op_token, value)
 
+    # Logic operations evaluate the left operand first and skip the right one when the left decides the result
     def visit_BinOpNode(self, node: BinOpNode, context: Context):
+        if node.op_token.type == TokenType.KEYWORD:
+            left = self.visit(node.left_node, context)
+            if self.short_circuits(left, node.op_token):
+                return left
+            right = self.visit(node.right_node, context)
+            return self.binary_operation(left, node.op_token, right, node)
+
         right = self.visit(node.right_node, context)
         left = self.visit(node.left_node, context)
-        op_token = node.op_token
-
-        try:
-            
-            result = None
-
-            # ARITHMETIC OPERATIONS
-            if op_token.type == TokenType.PLUS:
-                result = left.value + right.value
-            elif op_token.type == TokenType.MINUS:
-                result = left.value - right.value
-            elif op_token.type == TokenType.MULTIPLY:
-                result = left.value * right.value
-            elif op_token.type == TokenType.DIVIDE:
-                if right.value == 0:
-                    raise ZeroDivisionError("Division by zero", node.right_node.position)
-                result = left.value / right.value
-            elif op_token.type == TokenType.MOD:
-                result = left.value % right.value
-
-            if result:
-                return Integer(result) if type(result) == int else Float(result)
-
-            # COMPARATION OPERATIONS
-            elif op_token.type == TokenType.DOUBLE_EQUALS:
-                result = left.value == right.value
-            elif op_token.type == TokenType.NOT_EQUALS:
-                result = left.value != right.value
-            elif op_token.type == TokenType.GREATER:
-                result = left.value > right.value
-            elif op_token.type == TokenType.GREATER_EQUALS:
-                result = left.value >= right.value
-            elif op_token.type == TokenType.LOWER:
-                result = left.value < right.value
-            elif op_token.type == TokenType.LOWER_EQUALS:
-                result = left.value <= right.value
-
-            # LOGIC OPERATIONS
-            elif op_token.matches(TokenType.KEYWORD, 'and'):
-                result = left.value and right.value
-            elif op_token.matches(TokenType.KEYWORD, 'or'):
-                result = left.value or right.value
-
-            result_type = type(result)
-            if result_type == int:
-                return Integer(result)
-            elif result_type == float:
-                return Float(result)
-            elif result_type == bool:
-                return Boolean(result)
-            elif result_type == str:
-                return String(result)
-            else:
-                return Value(result).wrap()
+        return self.binary_operation(left, node.op_token, right, node)
 
-            # # Wrapping the result in the corresponding value type
-            # return Value(result).wrap()
+    # OPERATIONS
+    # Shared by the tree walking visit methods and the virtual machine
+    #######################################
+    def unary_operation(self, op_token, value):
+        if op_token.type == TokenType.MINUS:
+            result = - value.value
+            return Integer.of(result) if type(result) == int else Float(result)
+        if op_token.matches(TokenType.KEYWORD, 'not'):
+            result = not value.value
+            return Boolean.of(result)
+
+    # Returns True if the left operand of a logic operation is its result, without evaluating the right one
+    #   false and [expression], true or [expression]
+    def short_circuits(self, left, op_token):
+        if not isinstance(left, Value):
+            return False        # Left for binary_operation to raise the error
+        return bool(left.value) is (op_token.value == 'or')
+
+    # The operation is looked up by operator and operand types once, and cached on the node
+    # while the node keeps seeing the same types
+    def binary_operation(self, left, op_token, right, node: BinOpNode):
+        left_type = type(left)
+        right_type = type(right)
+        if node.left_type is not left_type or node.right_type is not right_type:
+            node.operation = find_operation(operator_key(op_token), left_type, right_type)
+            node.left_type = left_type
+            node.right_type = right_type
 
+        try:
+            operation = node.operation
+            if operation is None:
+                return generic_operation(operator_key(op_token), left, right)
+            wrap, function = operation
+            return wrap(function(left.value, right.value))
         except Exception as error:
-            raise TypeErrorDsl(f"Runtime math error: {left.type()}:{left.value} {op_token} {right.type()}:{right.value} {error}", node.position)
+            raise TypeErrorDsl(f"Runtime math error: {left.type()}:{left} {op_token} {right.type()}:{right} {error}", node.position)
+    #######################################
 
 
-    def run(self, command, context):
+    # Compiles and executes the command, identical commands reuse the cached Program
+    # If use_vm is set, the tree is compiled and executed by the VirtualMachine instead
+    def run(self, command, context, use_vm = False):
         try:
-            lexer = Lexer(command)
-            tokens = lexer.generate_tokens()
+            program = compile(command)
+        except Error as error:
+            return self.handle_error(error, command)
+        return self.execute(program, context, use_vm)
 
-            parser = Parser(tokens)
-            ast = parser.parse()
-            
-            result = self.visit(ast, context)
+    # Executes an already compiled Program in the given context
+    def execute(self, program: Program, context, use_vm = False):
+        try:
+            if use_vm:
+                from vm import VirtualMachine
+                result = VirtualMachine().visit(program.ast, context)
+            else:
+                try:
+                    result = self.visit(program.ast, context)
+                except FunctionReturn as function_return:
+                    result = function_return.value      # return at the top level ends the program
             return 0
         except Error as error:
-            return self.handle_error(error, command)
+            return self.handle_error(error, program.source)
+        except RecursionError:
+            return self.handle_error(RecursionErrorDsl('maximum recursion depth exceeded', None))
 
     # Execute dsl Function object
     # Args are python types
@@ -339,10 +466,27 @@ class Interpreter:
             return function.execute(wrapped_args, context, self.visit)
         except Error as e:
             self.handle_error(e)
+        except RecursionError:
+            self.handle_error(RecursionErrorDsl('maximum recursion depth exceeded', None))
 
 
+    # Calls the body of a trigger if its guard passes, errors are handled as in call
+    def run_trigger(self, trigger, wrapped_args, keyword_found = False):
+        try:
+            if trigger.guard is not None and not trigger.guard.check(wrapped_args, self.visit, keyword_found):
+                return NULL
+            return trigger.function.execute(wrapped_args, trigger.trigger_context, self.visit)
+        except Error as e:
+            self.handle_error(e)
+        except RecursionError:
+            self.handle_error(RecursionErrorDsl('maximum recursion depth exceeded', None))
+
+    # Without the command, as for errors of calls and triggers, the message has no source pointer
     def handle_error(self, error:Error, command = None):
-        if error.position:
+        if error.position and command is None:
+            start, end = error.position
+            error_message = f'{error} at line {start.line}'
+        elif error.position:
             start, end = error.position
             error_message = f'{error} at line {start.line} {f", character {start.character}" if not end else ""}\n{self.pointer_string(command, error.position)}'
         else:
@@ -368,12 +512,7 @@ class Interpreter:
     # Returns the abstract syntax tree
     def parse(self, command, context):
         try:
-            lexer = Lexer(command)
-            tokens = lexer.fast_generate_tokens()
-
-            parser = Parser(tokens)
-            ast = parser.parse()
-            return ast
+            return compile(command).ast
         except Error as error:
             if error.position:
                 start, end = error.position
@@ -384,28 +523,17 @@ class Interpreter:
     #########################################
 
 
-    # TEMP CODE     TODO: Centralice the io access on either shell or interpreter
+    # Modules are executed once per process by the module registry, importers share their bindings
     def import_file(self, path, context):
-        from os.path import exists
-        if exists(f'built_in_modules/{path}.dsl'):          # Check if an equally named module exist in the built in modules
-            path = f'built_in_modules/{path}.dsl'               # If it does, load that module instead
-        elif exists(f'{path}.dsl'):                         # Check if the module exist
-            path = f'{path}.dsl'
-        else:
-            raise TypeErrorDsl(f"No script named {file.name} found")
-
-        lines = []
-        with open(path, 'r') as file:
-            lines += file.readlines()
-            program = ''
-            for line in lines:
-                if '#' in line:
-                    line = line[0:line.index('#')]
-                program += line
-            result = self.run(program, context)
-            if result != 0:
-                print(result)
-            return result
+        return modules.import_module(path, context, self)
+
+    # Compiles the file through the compiled module cache and executes it
+    def run_file(self, path, context, use_vm = False):
+        try:
+            program = load(path)
+        except Error as error:
+            return self.handle_error(error, read_source(path))
+        return self.execute(program, context, use_vm)
 
 
     # Returns the given text with a pointer towards the character in the given position
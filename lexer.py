@@ -1,6 +1,7 @@
+import re
 import string
 
-from tokens import Token, TokenType, Position
+from tokens import Token, TokenType, Source, Span
 
 from errors import IllegalCharErrorDsl, SyntaxErrorDsl
 
@@ -20,6 +21,10 @@ KEYWORDS = [
     'false',
     'if',
     'for',
+    'in',
+    'while',
+    'break',
+    'continue',
     'else',
     'function',
     'end',
@@ -32,203 +37,160 @@ KEYWORDS = [
     'private'
 ]
 
+# SCANNER TABLES
+##################################
+KEYWORD_SET         = frozenset(KEYWORDS)
+
+# Matches one token and the whitespace before it, the matched group selects how the token is built
+# Strings with escapes or line breaks are matched whole but scanned again by generate_string
+TOKEN               = re.compile(r"""[ \t]*(?:
+      (?P<identifier>   [a-zA-Z][a-zA-Z0-9_]*                       )
+    | (?P<single>       [-+*/%()\[\]:,.{]                           )
+    | (?P<number>       [0-9]+ (\.[0-9]*)?                          )
+    | (?P<eol>          \n                                          )
+    | (?P<logic_op>     [=!<>] =?                                   )
+    | (?P<string>       "[^"\\\n]*" | '[^'\\\n]*'                   )
+    | (?P<escaped>      "(?:[^"\\]|\\[\s\S])*" | '(?:[^'\\]|\\[\s\S])*' )
+    | (?P<quote>        ["']                                        )
+    | (?P<end>          \}                                          )
+    | (?P<illegal>      [^ \t]                                      )
+)""", re.VERBOSE)
+
+MATCH_IDENTIFIER    = TOKEN.groupindex['identifier']
+MATCH_SINGLE        = TOKEN.groupindex['single']
+MATCH_NUMBER        = TOKEN.groupindex['number']
+MATCH_EOL           = TOKEN.groupindex['eol']
+MATCH_LOGIC_OP      = TOKEN.groupindex['logic_op']
+MATCH_STRING        = TOKEN.groupindex['string']
+MATCH_ESCAPED       = TOKEN.groupindex['escaped']
+MATCH_QUOTE         = TOKEN.groupindex['quote']
+MATCH_END           = TOKEN.groupindex['end']
+MATCH_ILLEGAL       = TOKEN.groupindex['illegal']
+
+STRING_CHUNK        = {
+    '"' : re.compile(r'[^"\\\n]+'),
+    "'" : re.compile(r"[^'\\\n]+"),
+}
+
+# Tokens made of a single character
+SINGLE_CHAR_TOKENS  = {
+    '+' : TokenType.PLUS,
+    '-' : TokenType.MINUS,
+    '*' : TokenType.MULTIPLY,
+    '/' : TokenType.DIVIDE,
+    '%' : TokenType.MOD,
+    '(' : TokenType.LPAREN,
+    ')' : TokenType.RPAREN,
+    '[' : TokenType.LSQUARE,
+    ']' : TokenType.RSQUARE,
+    ':' : TokenType.COLON,
+    ',' : TokenType.COMMA,
+    '.' : TokenType.DOT,
+    '{' : TokenType.COLON,      # Optional  TEST
+}
+
+LOGIC_OP_TOKENS     = {
+    '='  : TokenType.EQUALS,
+    '>'  : TokenType.GREATER,
+    '<'  : TokenType.LOWER,
+    '==' : TokenType.DOUBLE_EQUALS,
+    '>=' : TokenType.GREATER_EQUALS,
+    '<=' : TokenType.LOWER_EQUALS,
+    '!=' : TokenType.NOT_EQUALS,
+}
+
+STRING_ESCAPES      = {
+    'n'  : '\n',
+    't'  : '\t',
+    '\\' : '\\',
+    '\'' : '\'',
+}
+##################################
+
+# Index based scanner, works on offsets of the source string instead of one character at a time
+# Tokens only hold their offsets, lines and characters are computed by the Source when needed
 class Lexer:
     def __init__(self, text):
-        self.text = iter(text)
-        self.position = Position(-1, 0)
-        self.advance()
-
-    def advance(self):
-        try:
-            self.current_char = next(self.text)
-            self.position.character += 1
-        except StopIteration:
-            self.current_char = None
+        self.text = text
+        self.source = Source(text)
 
     # Lexer entry point, returns a generator object with all the tokens found
     def generate_tokens(self):
-        while self.current_char != None:
-
-            if self.current_char in WHITESPACE:
-                self.advance()
-
-            elif self.current_char in DIGITS:
-                yield self.generate_number()
-
-            elif self.current_char in LETTERS:
-                yield self.generate_identifier()
-
-            elif self.current_char in LOGIC_OP:
-                yield self.generate_logic_op()
-
-            elif self.current_char == '"':
-                yield self.generate_string()
-
-            elif self.current_char == "'":
-                yield self.generate_string()
-                
-            elif self.current_char == '+':
-                self.advance()
-                yield Token(TokenType.PLUS, (self.position,None))
-
-            elif self.current_char == '-':
-                self.advance()
-                yield Token(TokenType.MINUS, (self.position,None))
-
-            elif self.current_char == '*':
-                self.advance()
-                yield Token(TokenType.MULTIPLY, (self.position,None))
-
-            elif self.current_char == '/':
-                self.advance()
-                yield Token(TokenType.DIVIDE, (self.position,None))
-
-            elif self.current_char == '%':
-                self.advance()
-                yield Token(TokenType.MOD, (self.position,None))
-
-            elif self.current_char == '(':
-                self.advance()
-                yield Token(TokenType.LPAREN, (self.position,None))
-
-            elif self.current_char == ')':
-                self.advance()
-                yield Token(TokenType.RPAREN, (self.position,None))
-
-            elif self.current_char == '[':
-                self.advance()
-                yield Token(TokenType.LSQUARE, (self.position,None))
-
-            elif self.current_char == ']':
-                self.advance()
-                yield Token(TokenType.RSQUARE, (self.position,None))
-
-            elif self.current_char == ':':
-                self.advance()
-                yield Token(TokenType.COLON, (self.position,None))
+        text = self.text
+        source = self.source
+
+        for match in TOKEN.finditer(text):
+            kind = match.lastindex
+            start = match.start(kind)
+            end = match.end()
+
+            if kind == MATCH_IDENTIFIER:
+                identifier = match.group(kind)
+                # If the identifier found matches with any of the keywords, the returned token type will be keyword instead
+                token_type = TokenType.KEYWORD if identifier in KEYWORD_SET else TokenType.IDENTIFIER
+                yield Token(token_type, source, start, end, identifier)
+
+            elif kind == MATCH_SINGLE:
+                yield Token(SINGLE_CHAR_TOKENS[text[start]], source, start, end)
+
+            elif kind == MATCH_NUMBER:
+                number = match.group(kind)
+                if match.group(kind + 1) is not None:
+                    yield Token(TokenType.FLOAT, source, start, end, float(number))
+                else:
+                    yield Token(TokenType.INT, source, start, end, int(number))
 
-            elif self.current_char == ',':
-                self.advance()
-                yield Token(TokenType.COMMA, (self.position,None))
+            elif kind == MATCH_EOL:
+                yield Token(TokenType.EOL, source, start, end)
 
-            elif self.current_char == '.':
-                self.advance()
-                yield Token(TokenType.DOT, (self.position,None))
+            elif kind == MATCH_LOGIC_OP:
+                operator = match.group(kind)
+                if operator == '!':
+                    raise SyntaxErrorDsl('Invalid syntax', Span(source, start, end))
+                yield Token(LOGIC_OP_TOKENS[operator], source, start, end)
 
-            elif self.current_char == '\n':
-                self.position.line += 1
-                self.position.character = -1
-                self.advance()
-                yield Token(TokenType.EOL, (self.position,None))
+            elif kind == MATCH_STRING:
+                yield Token(TokenType.STRING, source, start, end, text[start + 1:end - 1])
 
-            # Optional  TEST
-            ####################################################
-            elif self.current_char == '{':
-                self.advance()
-                yield Token(TokenType.COLON, (self.position,None))
+            elif kind == MATCH_END:
+                yield Token(TokenType.KEYWORD, source, start, end, 'end')
 
-            elif self.current_char == '}':
-                self.advance()
-                yield Token(TokenType.KEYWORD, (self.position,None), 'end')    
-            ####################################################
+            elif kind == MATCH_ILLEGAL:
+                raise IllegalCharErrorDsl(f"'{text[start]}'", Span(source, start, end))
 
+            # Strings with escapes or line breaks, and unclosed strings
             else:
-                char = self.current_char
-                self.advance()
-                raise IllegalCharErrorDsl(f"'{char}'", (self.position,None))
-
-        yield Token(TokenType.EOF, (self.position,None))
-        
-    # Generates number token with all digits found as value
-    def generate_number(self):
-        decimal_point_count = 0
-        number = self.current_char
-        start_position = self.position.copy()
-        self.advance()
-
-        while self.current_char != None and self.current_char in DIGITS + '.':
-            if self.current_char == '.':
-                decimal_point_count += 1
-                if decimal_point_count > 1:
-                    break
-
-            number += self.current_char
-            self.advance()
-
-        if decimal_point_count > 0:
-            return Token(TokenType.FLOAT, (start_position, self.position), float(number))
-        else:
-            return Token(TokenType.INT, (start_position, self.position), int(number))
-
-    # Generates either double char or single char logic operator, or equals token
-    def generate_logic_op(self):
-        first_op = self.current_char
-        start_position = self.position.copy()
-        self.advance()
-        
-        if self.current_char != '=':
-            if first_op == '=':
-                token = Token(TokenType.EQUALS, (start_position, self.position))
-            elif first_op == '>':
-                token = Token(TokenType.GREATER, (start_position, self.position))
-            elif first_op == '<':
-                token = Token(TokenType.LOWER, (start_position, self.position))
-            elif first_op == '!':
-                raise SyntaxErrorDsl('Invalid syntax', (start_position, self.position))
-        elif self.current_char == '=':
-            if first_op == '=':
-                token = Token(TokenType.DOUBLE_EQUALS, (start_position, self.position))
-            elif first_op == '>':
-                token = Token(TokenType.GREATER_EQUALS, (start_position, self.position))
-            elif first_op == '<':
-                token = Token(TokenType.LOWER_EQUALS, (start_position, self.position))
-            elif first_op == '!':
-                token = Token(TokenType.NOT_EQUALS, (start_position, self.position))
-            self.advance()
-
-        return token
-    
-    # Generates string token with all characters found between '"' as value
-    def generate_string(self):
-        string_value = ''
-        starting_quote = self.current_char
-        start_position = self.position.copy()
-        self.advance()
-
-        while self.current_char is not None and self.current_char != starting_quote:
-            if self.current_char == '\\':
-                self.advance()
-                if self.current_char == 'n':
-                    string_value += '\n'
-                elif self.current_char == 't':
-                    string_value += '\t'
-                elif self.current_char == '\\':
-                    string_value += '\\'
-                elif self.current_char == '\'':
-                    string_value += '\''
-                else:
-                    raise SyntaxErrorDsl('Expected \\n , \\t , \\', self.position)
-            elif self.current_char == '\n':
-                self.position.line += 1
-                self.position.character = -1
+                yield self.generate_string(start)
+
+        yield Token(TokenType.EOF, source, len(text), len(text))
+
+    # Generates string token with all characters found between quotes as value
+    # Line breaks inside the string are skipped, unclosed strings and unknown escapes raise an error
+    def generate_string(self, start):
+        text = self.text
+        length = len(text)
+        starting_quote = text[start]
+        chunk = STRING_CHUNK[starting_quote]
+
+        parts = []
+        index = start + 1
+        while index < length and text[index] != starting_quote:
+            char = text[index]
+            if char == '\\':
+                index += 1
+                escape = STRING_ESCAPES.get(text[index]) if index < length else None
+                if escape is None:
+                    raise SyntaxErrorDsl('Expected \\n , \\t , \\', Span(self.source, index - 1, index + 1))
+                parts.append(escape)
+                index += 1
+            elif char == '\n':
+                index += 1
             else:
-                string_value += self.current_char
-            self.advance()
-            if self.current_char is None:
-                raise SyntaxErrorDsl('Unclosed string literal', (start_position, self.position))
-        self.advance()
-
-        return Token(TokenType.STRING, (start_position, self.position), string_value)
-
-    # Generates identifier all characters, digits and '_' found as value
-    def generate_identifier(self):
-        identifier = ''
-        start_position = self.position.copy()
-
-        while self.current_char is not None and self.current_char in LETTERS_DIGITS + '_':
-            identifier += self.current_char
-            self.advance()
-
-        # If the identifier found matches with any of the keywords, the returned token type will be keyword instead
-        token_type = TokenType.KEYWORD if identifier in KEYWORDS else TokenType.IDENTIFIER
-        return Token(token_type, (start_position, self.position), identifier)
+                match = chunk.match(text, index)
+                parts.append(match.group())
+                index = match.end()
+
+            if index >= length:
+                raise SyntaxErrorDsl('Unclosed string literal', Span(self.source, start, length))
+
+        return Token(TokenType.STRING, self.source, start, min(index + 1, length), ''.join(parts))
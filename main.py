@@ -1,5 +1,5 @@
 import discord
-from shell import Shell
+from shell import ShellSession
 from events import EventType, Event
 
 # Discord bot token
@@ -10,6 +10,7 @@ with open('TOKEN.txt', 'r', encoding='utf8') as file:
 def main():
 
     client = discord.Client()
+    session = ShellSession()
 
     @client.event
     async def on_ready():
@@ -30,7 +31,7 @@ def main():
                 print(f'{message.guild}: #{message.channel} <- {{EMPTY}}')
 
 
-        shell = Shell(output_callback, message.guild, message.channel)
+        shell = session.get_shell(output_callback, message.guild, message.channel)
 
         text = message.content
         result = None
@@ -40,7 +41,6 @@ def main():
         if text.startswith('$'):
             text = text[1:len(text)]
             print(f'{message.guild}: #{message.channel} >> {text}')
-            shell.change_context(message.guild, message.channel)
             result = shell.run_command(text)
 
         elif text.startswith('```') and text.endswith('```'):
@@ -48,13 +48,11 @@ def main():
             if text.startswith('dsl'):
                 text = text[3:len(text)]
                 print(f'{message.guild}: #{message.channel} >> code block:\n{text}')
-                shell.change_context(message.guild, message.channel)
                 result = shell.run_command(text)
 
         # If input is just a message
         # Send a text input to the shell
         else:
-            shell.change_context(message.guild, message.channel)
             author = ''
             if isinstance(message.author, discord.Member):
                 author = message.author.nick if message.author.nick else message.author.name
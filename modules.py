@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from os.path     import exists
+
+from context    import Context, SymbolTable
+from native_modules import NATIVE_MODULES
+
+from errors     import TypeErrorDsl
+
+BUILT_IN_MODULES = 'built_in_modules'
+
+# Imported module, executed once into its own context
+@dataclass
+class Module:
+    name: str
+    path: str
+    context: Context
+
+    def __repr__(self):
+        return f'<module {self.name}>'
+
+# Holds every module imported by the process
+# A module is executed the first time it is imported, later imports only share its values
+class ModuleRegistry:
+
+    def __init__(self):
+        self.paths = {}         # module name -> resolved file path
+        self.modules = {}       # resolved file path -> Module
+
+    # Returns the file of a module, native and built in modules take precedence over equally named scripts
+    # Native modules have no file, their path is only their key in the registry
+    def resolve(self, name):
+        path = self.paths.get(name)
+        if path is None:
+            if name in NATIVE_MODULES:
+                path = f'<native>/{name}'
+            elif exists(f'{BUILT_IN_MODULES}/{name}.dsl'):
+                path = f'{BUILT_IN_MODULES}/{name}.dsl'
+            elif exists(f'{name}.dsl'):
+                path = f'{name}.dsl'
+            else:
+                raise TypeErrorDsl(f'No script named {name} found', None)
+            self.paths[name] = path
+        return path
+
+    # Returns the Module, executing it first if it wasnt imported before
+    # The module context only sees the built ins, so its bindings dont depend on who imported it first
+    # Returns None if the module failed, it will be executed again on the next import
+    # Modules cant define triggers, they would belong to no guild or channel
+    def load(self, name, context: Context, interpreter):
+        path = self.resolve(name)
+        module = self.modules.get(path)
+        if module is None:
+            root = context.get_root_context()
+            built_ins = root.symbol_table.parent or root.symbol_table
+
+            module_context = Context(f'module {name}', SymbolTable(built_ins))
+            if name in NATIVE_MODULES:
+                for function in NATIVE_MODULES[name]:
+                    module_context.symbol_table.define(function.name, function)
+            else:
+                # Writes and errors of the module body are sent to the context that imports it first
+                module_context.output = context.get_output()
+                try:
+                    result = interpreter.run_file(path, module_context)
+                    if result != 0:
+                        print(result)
+                        module_context.send_output(f'{result}')
+                        return None
+                finally:
+                    module_context.output = None
+
+            module = Module(name, path, module_context)
+            self.modules[path] = module
+        return module
+
+    # Binds the public values of a module in the context, the bindings belong to the importing table
+    def import_module(self, name, context: Context, interpreter):
+        module = self.load(name, context, interpreter)
+        if module is not None:
+            context.symbol_table.share(module.context.symbol_table)
+        return module
+
+    def clear(self):
+        self.paths.clear()
+        self.modules.clear()
+
+modules = ModuleRegistry()
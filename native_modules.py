@@ -0,0 +1,90 @@
+import math
+
+from values     import BuiltInFunction, Value, Integer, Float
+from context    import Context
+
+from errors     import TypeErrorDsl
+
+# NATIVE MODULES
+# Modules implemented in python, imported like any script module: import [name]
+# Each module is the list of functions its import binds
+##################################
+
+# Functions of the math module, angles are in degrees
+class MathFunction(BuiltInFunction):
+
+    # Python math errors (negative square roots, huge factorials, zero to negative powers..) are raised as dsl errors
+    def execute(self, args, context: Context, visit = None):
+        try:
+            return super().execute(args, context, visit)
+        except (ValueError, ArithmeticError, TypeError) as error:
+            raise TypeErrorDsl(f'{self.name}() math error: {error}', None)
+
+    def execute_pi(self, context: Context):
+        return Float(math.pi)
+    execute_pi.arg_names = []
+
+    def execute_pow(self, context: Context):
+        base     = context.symbol_table.get('base').value
+        exponent = context.symbol_table.get('exponent').value
+        result = base ** exponent
+        if type(result) is complex:         # Fractional powers of negative numbers, like sqrt of them
+            raise ValueError('math domain error')
+        return Value(result).wrap()
+    execute_pow.arg_names = [('base', None), ('exponent', None)]
+
+    def execute_factorial(self, context: Context):
+        n = context.symbol_table.get('n').value
+        return Integer.of(math.factorial(n))
+    execute_factorial.arg_names = [('n', 'int')]
+
+    def execute_sqrt(self, context: Context):
+        value = context.symbol_table.get('value').value
+        return Float(math.sqrt(value))
+    execute_sqrt.arg_names = [('value', None)]
+
+    def execute_rad(self, context: Context):
+        angle = context.symbol_table.get('angle').value
+        return Float(math.radians(angle))
+    execute_rad.arg_names = [('angle', None)]
+
+    def execute_sin(self, context: Context):
+        angle = context.symbol_table.get('angle').value
+        return Float(math.sin(math.radians(angle)))
+    execute_sin.arg_names = [('angle', None)]
+
+    def execute_cos(self, context: Context):
+        angle = context.symbol_table.get('angle').value
+        return Float(math.cos(math.radians(angle)))
+    execute_cos.arg_names = [('angle', None)]
+
+    def execute_fibonacci(self, context: Context):
+        n = context.symbol_table.get('n').value
+        current, previous = 0, 1
+        for i in range(int(n)):
+            current, previous = current + previous, current
+        return Integer.of(current)
+    execute_fibonacci.arg_names = [('n', None)]
+
+    # Leibniz series with n terms, same approximation as the former math.dsl
+    def execute_compt_pi(self, context: Context):
+        n = context.symbol_table.get('n').value
+        s = 0
+        k = 1
+        sign = 1
+        for i in range(int(n)):
+            s = s + sign * (4 / k)
+            sign = -sign
+            k = k + 2
+        return Value(s).wrap()
+    execute_compt_pi.arg_names = [('n', None)]
+
+    def __repr__(self):
+        return f'<built_in_function math.{self.name}>'
+
+MATH_MODULE = [MathFunction(name) for name in ('pi', 'pow', 'factorial', 'sqrt', 'rad', 'sin', 'cos', 'fibonacci', 'compt_pi')]
+
+NATIVE_MODULES = {
+    'math': MATH_MODULE,
+}
+##################################
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 
-from tokens import Token, Position
+from tokens import Token, Span
 from context import AccessType
 
 # DEFINITION OF THE ABSTRACT SYNTAX TREE NODES
@@ -9,7 +9,7 @@ from context import AccessType
 
 @dataclass
 class Node:
-    position: tuple[Position, Position]
+    position: Span
 
 # VALUES
 ##################################
@@ -83,6 +83,10 @@ class ReturnNode(Node):
 class VarAccessNode(Node):
     var_name_token: Token
 
+    # Frame slot and depth set by the Resolver, unresolved variables are looked up by name
+    slot = None
+    depth = 0
+
     def __init__(self, var_name_token: Token):
         super().__init__(var_name_token.position)
         self.var_name_token = var_name_token
@@ -114,6 +118,8 @@ class AttributeAccessNode(Node):
     object_value: VarAccessNode
     attribute_node: VarAccessNode
 
+    cache = None        # AttributeCache set on the first access
+
     def __repr__(self):
         return f'OBJECT[{self.object_value}].ATTRIBUTE[{self.attribute_node}]'
 
@@ -166,6 +172,11 @@ class BinOpNode(Node):
         self.op_token = op_token
         self.right_node = right_node
 
+    # Operation of the last operand types seen, set by the interpreter on the first evaluation
+    left_type = None
+    right_type = None
+    operation = None
+
     def __repr__(self):
         return f'({self.left_node}, {self.op_token.symbol()}, {self.right_node})'
 
@@ -197,9 +208,47 @@ class ForNode(Node):
     steps: any
     identifier: Token = None
 
+    slot = None         # Frame slot of the loop variable set by the Resolver
+
     def __repr__(self):
         return f'FOR {self.identifier.value}<{self.steps}: {self.body_node}'
 
+# Loops over the elements of the iterable value, or over the range from iterable to stop by step if stop is given
+@dataclass
+class ForInNode(Node):
+    body_node: Node
+    identifier: Token
+    iterable: Node
+    stop: Node = None
+    step: Node = None
+
+    slot = None         # Frame slot of the loop variable set by the Resolver
+
+    def __repr__(self):
+        if self.stop is None:
+            return f'FOR {self.identifier.value} IN {self.iterable}: {self.body_node}'
+        return f'FOR {self.identifier.value} IN {self.iterable},{self.stop},{self.step}: {self.body_node}'
+
+@dataclass
+class WhileNode(Node):
+    condition: any
+    body_node: Node
+
+    def __repr__(self):
+        return f'WHILE {self.condition}: {self.body_node}'
+
+@dataclass
+class BreakNode(Node):
+
+    def __repr__(self):
+        return 'BREAK'
+
+@dataclass
+class ContinueNode(Node):
+
+    def __repr__(self):
+        return 'CONTINUE'
+
 @dataclass
 class FuncDefNode(Node):
     body_node: Node
@@ -208,6 +257,8 @@ class FuncDefNode(Node):
     arg_type_tokens: list = None
     access: AccessType = AccessType.PUBLIC
 
+    layout = None       # FrameLayout set by the Resolver
+
     def __repr__(self):
         func_name = f'{self.func_name_token.value}' if self.func_name_token is not None else '<anonymus>'
         return f'FUNCTION->{func_name} (args({self.arg_name_tokens}) body({self.body_node}))'
@@ -240,6 +291,8 @@ class TriggerDefNode(Node):
     body_node: Node
     event: VarAccessNode
 
+    layout = None       # FrameLayout set by the Resolver
+
     def __repr__(self):
         return f'TRIGGERS <-{self.event.var_name_token.value}: {self.body_node}'
     
\ No newline at end of file
@@ -0,0 +1,111 @@
+import operator
+from array      import array
+from itertools  import repeat
+
+from values     import Value, Integer, Float, String, Boolean, Array
+from tokens     import TokenType
+
+# BINARY OPERATIONS
+# Each operation is a (wrap, function) pair, the result of an operation is wrap(function(left.value, right.value))
+# OPERATIONS holds the operations specialized by operator and operand types, where the type of the result is known
+# Any other combination of types goes through generic_operation, that wraps the result by its python type
+##################################
+def logic_and(left, right):
+    return left and right
+
+def logic_or(left, right):
+    return left or right
+
+# Python function of each operator, keyed by token type or keyword
+OPERATORS = {
+    TokenType.PLUS              : operator.add,
+    TokenType.MINUS             : operator.sub,
+    TokenType.MULTIPLY          : operator.mul,
+    TokenType.DIVIDE            : operator.truediv,
+    TokenType.MOD               : operator.mod,
+    TokenType.DOUBLE_EQUALS     : operator.eq,
+    TokenType.NOT_EQUALS        : operator.ne,
+    TokenType.GREATER           : operator.gt,
+    TokenType.GREATER_EQUALS    : operator.ge,
+    TokenType.LOWER             : operator.lt,
+    TokenType.LOWER_EQUALS      : operator.le,
+    'and'                       : logic_and,
+    'or'                        : logic_or,
+}
+
+ARITHMETIC  = (TokenType.PLUS, TokenType.MINUS, TokenType.MULTIPLY, TokenType.MOD)
+COMPARISON  = (TokenType.DOUBLE_EQUALS, TokenType.NOT_EQUALS, TokenType.GREATER, TokenType.GREATER_EQUALS, TokenType.LOWER, TokenType.LOWER_EQUALS)
+NUMBERS     = (Integer, Float)
+
+OPERATIONS = {}
+
+for op_key in ARITHMETIC:
+    OPERATIONS[op_key, Integer, Integer]    = (Integer.of, OPERATORS[op_key])
+    OPERATIONS[op_key, Integer, Float]      = (Float, OPERATORS[op_key])
+    OPERATIONS[op_key, Float, Integer]      = (Float, OPERATORS[op_key])
+    OPERATIONS[op_key, Float, Float]        = (Float, OPERATORS[op_key])
+
+for left_type in NUMBERS:
+    for right_type in NUMBERS:
+        OPERATIONS[TokenType.DIVIDE, left_type, right_type] = (Float, operator.truediv)
+
+OPERATIONS[TokenType.PLUS, String, String] = (String, operator.add)
+
+for op_key in COMPARISON:
+    for left_type in NUMBERS:
+        for right_type in NUMBERS:
+            OPERATIONS[op_key, left_type, right_type] = (Boolean.of, OPERATORS[op_key])
+    OPERATIONS[op_key, String, String]      = (Boolean.of, OPERATORS[op_key])
+    OPERATIONS[op_key, Boolean, Boolean]    = (Boolean.of, OPERATORS[op_key])
+
+for op_key in ('and', 'or'):
+    OPERATIONS[op_key, Boolean, Boolean]    = (Boolean.of, OPERATORS[op_key])
+
+# Element-wise arithmetic on arrays, the other operand is an array of the same length or a number
+# The result is an int array if both operands hold ints and the operator keeps them ints, a float array otherwise
+class ElementWise:
+    __slots__ = ('function', 'typecode')
+
+    def __init__(self, function, typecode = None):
+        self.function = function
+        self.typecode = typecode        # Fixed typecode of the result, None to take it from the operands
+
+    def __call__(self, left, right):
+        typecode = self.typecode or ('d' if element_typecode(left) == 'd' or element_typecode(right) == 'd' else 'q')
+        if type(left) is memoryview and type(right) is memoryview:
+            if len(left) != len(right):
+                raise ValueError(f'arrays of different lengths {len(left)} and {len(right)}')
+            return array(typecode, map(self.function, left, right))
+        if type(left) is memoryview:
+            return array(typecode, map(self.function, left, repeat(right)))
+        return array(typecode, map(self.function, repeat(left), right))
+
+    def __getstate__(self):
+        return (self.function, self.typecode)
+
+    def __setstate__(self, state):
+        self.function, self.typecode = state
+
+def element_typecode(operand):
+    if type(operand) is memoryview:
+        return operand.format
+    return 'd' if type(operand) is float else 'q'
+
+for op_key in ARITHMETIC + (TokenType.DIVIDE,):
+    element_wise = ElementWise(OPERATORS[op_key], 'd' if op_key == TokenType.DIVIDE else None)
+    for other_type in (Array, Integer, Float):
+        OPERATIONS[op_key, Array, other_type] = (Array.of, element_wise)
+        OPERATIONS[op_key, other_type, Array] = (Array.of, element_wise)
+##################################
+
+# Returns the key of the operator of a token in OPERATORS
+def operator_key(op_token):
+    return op_token.value if op_token.type == TokenType.KEYWORD else op_token.type
+
+# Returns the specialized operation for the operator and operand types, or None if there is none
+def find_operation(op_key, left_type, right_type):
+    return OPERATIONS.get((op_key, left_type, right_type))
+
+# Operation for any other types, the result is wrapped in the value type matching its python type
+def generic_operation(op_key, left, right):
+    return Value(OPERATORS[op_key](left.value, right.value)).wrap()
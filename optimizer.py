@@ -0,0 +1,124 @@
+from nodes      import *
+from values     import Integer, Float, String, Boolean
+
+from tokens     import Token, TokenType, Span
+
+# Folded values and the nodes and tokens that represent them in the tree
+FOLDED_NODES = {
+    Integer : (IntegerNode, TokenType.INT),
+    Float   : (FloatNode,   TokenType.FLOAT),
+    String  : (StringNode,  TokenType.STRING),
+    Boolean : (BooleanNode, TokenType.KEYWORD),
+}
+
+# Rewrites the abstract syntax tree before it is executed, the result of the program doesnt change
+#   Operations on literals are folded into a single literal
+#   If statments with a literal condition are replaced by the branch that would run
+#   Void statments and statments after a return, break or continue are removed
+# Each optimize method returns the node that replaces the given one
+class Optimizer:
+
+    def __init__(self):
+        from interpreter import Interpreter
+        self.interpreter = Interpreter()        # Literals are folded by the same operations used at runtime
+
+    def optimize(self, node):
+        method = getattr(self, f'optimize_{type(node).__name__}', self.optimize_generic)
+        return method(node)
+
+    # Optimizes every child node in place
+    def optimize_generic(self, node):
+        if not isinstance(node, Node):
+            return node
+
+        for name, child in vars(node).items():
+            if isinstance(child, Node):
+                setattr(node, name, self.optimize(child))
+            elif isinstance(child, list):
+                child[:] = [self.optimize(element) for element in child]
+        return node
+
+    # STATMENTS
+    ##################################
+    def optimize_StatmentNode(self, node: StatmentNode):
+        element_nodes = []
+
+        for element_node in node.element_nodes:
+            if type(element_node) is VoidNode:
+                continue
+            if type(element_node) is IfNode:
+                element_node = self.prune_if(element_node)
+                if element_node is None:
+                    continue
+            element_nodes.append(self.optimize(element_node))
+            if type(element_node) in (ReturnNode, BreakNode, ContinueNode):
+                break           # The rest of the statment never runs
+
+        node.element_nodes = element_nodes
+        return node
+
+    # Returns the branch of an if statment with a literal condition, or None if no branch runs
+    # The branch stays a nested statment
+    def prune_if(self, node: IfNode):
+        condition = self.optimize(node.condition)
+        if not isinstance(condition, ValueNode):
+            node.condition = condition
+            return node
+
+        if type(condition) is BooleanNode and condition.value is True:
+            return node.if_case
+        return node.else_case
+    ##################################
+
+    # OPERATIONS
+    ##################################
+    def optimize_UnaryOpNode(self, node: UnaryOpNode):
+        node.node = self.optimize(node.node)
+        if not is_literal(node.node):
+            return node
+
+        try:
+            value = self.interpreter.unary_operation(node.op_token, self.literal(node.node))
+        except Exception:
+            return node         # Left for the runtime to raise the error
+        return self.fold(value, node.op_token.position, node.node.position) or node
+
+    def optimize_BinOpNode(self, node: BinOpNode):
+        node.left_node = self.optimize(node.left_node)
+        node.right_node = self.optimize(node.right_node)
+
+        # A literal left operand that decides a logic operation is its result, the right one never runs
+        if node.op_token.type == TokenType.KEYWORD and is_literal(node.left_node):
+            if self.interpreter.short_circuits(self.literal(node.left_node), node.op_token):
+                return node.left_node
+
+        if not (is_literal(node.left_node) and is_literal(node.right_node)):
+            return node
+
+        try:
+            left = self.literal(node.left_node)
+            right = self.literal(node.right_node)
+            value = self.interpreter.binary_operation(left, node.op_token, right, node)
+        except Exception:
+            return node         # Left for the runtime to raise the error
+        return self.fold(value, node.left_node.position, node.right_node.position) or node
+    ##################################
+
+    # Returns the value a literal node evaluates to
+    def literal(self, node: ValueNode):
+        return self.interpreter.visit(node, None)
+
+    # Returns a literal node holding the value, spanning from the start of the first span to the end of the last one
+    # Values without a literal representation are not folded
+    def fold(self, value, first: Span, last: Span):
+        folded = FOLDED_NODES.get(type(value))
+        if folded is None:
+            return None
+
+        node_class, token_type = folded
+        token_value = ('true' if value.value else 'false') if token_type == TokenType.KEYWORD else value.value
+        token = Token(token_type, first.source, first.start, last.end, token_value)
+        return node_class(token, value.value)
+
+def is_literal(node):
+    return isinstance(node, ValueNode) and type(node) is not VoidNode
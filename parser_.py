@@ -1,13 +1,41 @@
 from nodes  import *
-from tokens import TokenType, TypeGroups
+from tokens import TokenType
 from context import AccessType
 
 from errors import SyntaxErrorDsl
 
+# BINDING POWERS
+# Operators with higher power bind tighter
+##################################
+LOGIC_POWER         = 10    # and , or
+NOT_POWER           = 15    # not
+COMPARATION_POWER   = 20    # == , != , > , < , >= , <=     not associative
+ARITHMETIC_POWER    = 30    # + , -
+TERM_POWER          = 40    # * , / , %
+PREFIX_POWER        = 50    # - unary
+
+BINDING_POWER = {
+    'and'                       : LOGIC_POWER,
+    'or'                        : LOGIC_POWER,
+    TokenType.DOUBLE_EQUALS     : COMPARATION_POWER,
+    TokenType.NOT_EQUALS        : COMPARATION_POWER,
+    TokenType.GREATER           : COMPARATION_POWER,
+    TokenType.LOWER             : COMPARATION_POWER,
+    TokenType.GREATER_EQUALS    : COMPARATION_POWER,
+    TokenType.LOWER_EQUALS      : COMPARATION_POWER,
+    TokenType.PLUS              : ARITHMETIC_POWER,
+    TokenType.MINUS             : ARITHMETIC_POWER,
+    TokenType.MULTIPLY          : TERM_POWER,
+    TokenType.DIVIDE            : TERM_POWER,
+    TokenType.MOD               : TERM_POWER,
+}
+##################################
+
 
 class Parser:
     def __init__(self, generated_tokens):
         self.generated_tokens = iter(generated_tokens)
+        self.loop_depth = 0         # Number of loops around the current statment, break and continue need one
         self.advance()
 
     # Parsing rules can be found in grammar.txt
@@ -55,8 +83,6 @@ class Parser:
 
     def expr(self):
 
-        position = self.current_token.position
-
         # VoidNode              void
         ######################################################
         if self.current_token.matches(TokenType.KEYWORD, 'void'):
@@ -66,12 +92,21 @@ class Parser:
         #########
 
         if self.current_token.matches(TokenType.KEYWORD, 'return'):
+            position = self.current_token.position
             token = self.current_token
             self.advance()
             value = self.expr()
             return ReturnNode(position, value)
 
+        if self.current_token.matches(TokenType.KEYWORD, 'break') or self.current_token.matches(TokenType.KEYWORD, 'continue'):
+            token = self.current_token
+            if self.loop_depth == 0:
+                raise SyntaxErrorDsl(f"Invalid syntax, {token.value} outside of a loop", token.position)
+            self.advance()
+            return BreakNode(token.position) if token.value == 'break' else ContinueNode(token.position)
+
         if self.current_token.matches(TokenType.KEYWORD, 'import'):
+            position = self.current_token.position
             token = self.current_token
             self.advance()
             if self.current_token.type != TokenType.IDENTIFIER:
@@ -99,131 +134,96 @@ class Parser:
 
         #############################
 
-        return self.logic_op()
-
-    def logic_op(self):
-        left_node = self.comp_op()
-
-        # BinOpNode             comparation_operation token comparation
-        # for 'and' , 'or' logic operators
-        ##########
-        while self.current_token is not None and (self.current_token.matches(TokenType.KEYWORD, 'and') or self.current_token.matches(TokenType.KEYWORD, 'or')):
-            op_token = self.current_token
-            self.advance()
-            right_node = self.comp_op()
-            left_node = BinOpNode(left_node, op_token, right_node)
-        #############################
-
-        return left_node
-
-    def comp_op(self):
+        return self.operation()
 
-        left_node = self.arith_op()
+    # Pratt parser for operator expressions
+    # Parses a prefix expression, then keeps applying the infix operators that bind tighter than min_power
+    # Operator binding powers are listed in BINDING_POWER, new operators only need an entry there
+    def operation(self, min_power = 0):
+        token = self.current_token
+        rule = token.value if token.type == TokenType.KEYWORD else token.type
+        last_power = None
 
-        # UnaryOpNode           token arithmetic_operation
-        # for 'not' logic operator
+        # UnaryOpNode           not operation
+        # for 'not' logic operator, its operand extends up to the next 'and' , 'or'
         ######################################################
-        if self.current_token is not None and self.current_token.matches(TokenType.KEYWORD, 'not'):
-            op_token = self.current_token
+        if rule == 'not':
             self.advance()
-            return UnaryOpNode(op_token, self.comp_op())
-        #############################
+            left_node = UnaryOpNode(token, self.operation(LOGIC_POWER))
+            last_power = NOT_POWER
 
-        # BinOpNode             arithmetic_operation token arithmetic_operation
-        # for '>' , '<' , '==' , '>=' , '<=' , '!=' comparation operators
+        # UnaryOpNode           - operation
+        # for '-' arithmetic operator, binds tighter than any infix operator
         ######################################################
-        elif self.current_token is not None and self.current_token.type in TypeGroups.COMPARATION_OP:
-                
-            op_token = self.current_token
-
+        elif rule == TokenType.MINUS:
             self.advance()
+            left_node = UnaryOpNode(token, self.operation(PREFIX_POWER))
 
-            right_node = self.arith_op()
-            left_node = BinOpNode(left_node, op_token, right_node)
+        else:
+            prefix_rule = PREFIX_RULES.get(rule)
+            left_node = prefix_rule(self) if prefix_rule else self.primary()
         #############################
 
-        return left_node
-
-    def arith_op(self):
-        left_node = self.term()
-
-        # BinOpNode             term token term
-        # for '+' , '-' arithmetic operators
+        # BinOpNode             operation token operation
+        # left associative, comparation operators can only take arithmetic operations as operands
         ######################################################
-        while self.current_token is not None and self.current_token.type in (TokenType.PLUS, TokenType.MINUS):
+        while True:
             op_token = self.current_token
-            self.advance()
-            right_node = self.term()
-            left_node = BinOpNode(left_node, op_token, right_node)
-        #############################
+            if op_token is None:
+                break
 
-        return left_node
-
-    def term(self):
-        left_node = self.factor()
+            power = BINDING_POWER.get(op_token.value if op_token.type == TokenType.KEYWORD else op_token.type)
+            if power is None or power <= min_power:
+                break
+            if power == COMPARATION_POWER and last_power is not None and last_power <= power:
+                break
 
-        # BinOpNode             factor token factor
-        # for '*' , '/' arithmetic operators
-        ######################################################
-        while self.current_token is not None and self.current_token.type in (TokenType.MULTIPLY, TokenType.DIVIDE, TokenType.MOD):
-            op_token = self.current_token
             self.advance()
-            right_node = self.factor()
+            right_node = self.operation(power)
             left_node = BinOpNode(left_node, op_token, right_node)
+            last_power = power
         #############################
 
         return left_node
 
-    def factor(self):
-
-        # UnaryOpNode           token factor
-        # for '-' arithmetic operator
-        ######################################################
-        if self.current_token.type == TokenType.MINUS:
-            op_token = self.current_token
-            self.advance()
-            return UnaryOpNode(op_token, self.factor())
-        #############################
+    # Check for an entire new expression inside parentheses '( )'
+    #                       left_paren expression right_paren
+    ######################################################
+    def parenthesis(self):
+        self.advance()
+        result = self.expr()
+        if self.current_token.type != TokenType.RPAREN:
+            raise SyntaxErrorDsl("Invalid syntax, expected ')'", self.current_token.position)
 
-        # Check for an entire new expression inside parentheses '( )'
-        #                       left_paren expression right_paren
-        ######################################################
-        elif self.current_token.type == TokenType.LPAREN:
-            self.advance()
-            result = self.expr()
-            if self.current_token.type != TokenType.RPAREN:
-                raise SyntaxErrorDsl("Invalid syntax, expected ')'", self.current_token.position)
+        self.advance()
+        return result
 
-            self.advance()
-            return result
-        #############################
+    def primary(self):
+        attribute = self.attribute()
 
-        # Compound statmets if , function definition , list definition , for , TODO while ...
+        # Assingment nodes -> identifier    = value
+        #                     attribute     = value
+        #                     list          = value
         ######################################################
-        elif self.current_token.matches(TokenType.KEYWORD, 'function'):
-            return self.func_def()
-
-        elif self.current_token.matches(TokenType.KEYWORD, 'trigger'):
-            return self.trigger_def()
+        if self.current_token is not None and self.current_token.type == TokenType.EQUALS:
+            position = self.current_token.position
+            self.advance()
+            value_node = self.expr()
 
-        elif self.current_token.matches(TokenType.KEYWORD, 'class'):
-            return self.class_def()
+            attr_type = type(attribute)
+            if attr_type == VarAccessNode:
+                attribute = VarAssingNode(position, attribute.var_name_token, value_node)
 
-        elif self.current_token.matches(TokenType.KEYWORD, 'if'):
-            return self.if_expr()
+            elif attr_type == AttributeAccessNode:
+                attribute = AttributeAssingNode(position, attribute.object_value, attribute.attribute_node, value_node)
 
-        elif self.current_token.matches(TokenType.KEYWORD, 'for'):
-            return self.for_expr()
+            elif attr_type == ListAccessNode:
+                attribute = ListAssingNode(attribute.list_node, attribute.index_node, value_node)
 
-        elif self.current_token.type == TokenType.LSQUARE:
-            return self.list_expr()
+            else:
+                raise SyntaxErrorDsl(f"Invalid syntax, {attr_type} cant be assinged", self.current_token.position)
         #############################
 
-        return self.call()
-
-    def call(self):
-        attribute = self.assingment()
-
         # CallNode              attribute()
         ######################################################
         if self.current_token is not None and self.current_token.type == TokenType.LPAREN:
@@ -249,37 +249,8 @@ class Parser:
 
         return attribute
 
-    def assingment(self):
-        attribute = self.attribute()
-        position = self.current_token.position
-
-        # Assingment nodes -> identifier    = value
-        #                     attribute     = value
-        #                     list          = value
-        ######################################################
-        if self.current_token is not None and self.current_token.type == TokenType.EQUALS:
-            self.advance()
-            value_node = self.expr()
-
-            attr_type = type(attribute)
-            if attr_type == VarAccessNode:
-                return VarAssingNode(position, attribute.var_name_token, value_node)
-
-            elif attr_type == AttributeAccessNode:
-                return AttributeAssingNode(position, attribute.object_value, attribute.attribute_node, value_node)
-
-            elif attr_type == ListAccessNode:
-                return ListAssingNode(attribute.list_node, attribute.index_node, value_node)
-
-            else:
-                raise SyntaxErrorDsl(f"Invalid syntax, {attr_type} cant be assinged", self.current_token.position)
-
-        return attribute
-
     def attribute(self):
         value = self.value()
-        position = self.current_token.position
-
 
         if isinstance(value, VarAccessNode):
 
@@ -287,6 +258,7 @@ class Parser:
             ######################################################
             object_value = value
             if self.current_token.type == TokenType.DOT:
+                position = self.current_token.position
 
                 self.advance()
                 attribute = self.attribute()
@@ -427,7 +399,7 @@ class Parser:
 
         self.advance()
 
-        body_node = self.statment()
+        body_node = self.definition_body()
 
         return FuncDefNode(position, body_node, func_name_token, arg_name_tokens, arg_type_tokens)
 
@@ -468,7 +440,7 @@ class Parser:
 
         self.advance()
 
-        condition_node = self.logic_op()
+        condition_node = self.operation()
 
         if self.current_token.type != TokenType.RPAREN:
             raise SyntaxErrorDsl("Invalid syntax, expected ')'", self.current_token.position)
@@ -480,7 +452,7 @@ class Parser:
 
         self.advance()
 
-        function_node = self.statment()
+        function_node = self.definition_body()
 
         body_node = IfNode(position, condition_node, function_node)
 
@@ -508,7 +480,7 @@ class Parser:
 
         self.advance()
 
-        body_node = self.statment()
+        body_node = self.definition_body()
         return ClassDefNode(position, body_node, class_name_token)
 
     # IfNode                    if logic_operation: statment (else: statment)?
@@ -521,7 +493,7 @@ class Parser:
         position = self.current_token.position
 
         self.advance()
-        condition = self.logic_op()
+        condition = self.operation()
 
         if self.current_token.type != TokenType.COLON:
             raise SyntaxErrorDsl("Invalid syntax, expected ':'", self.current_token.position)
@@ -545,6 +517,10 @@ class Parser:
 
         return IfNode(position, condition, if_case, None)
 
+    # ForNode                   for identifier, steps: statment
+    # ForInNode                 for identifier in iterable: statment
+    #                           for identifier in start, stop (, step)?: statment
+    ######################################################################
     def for_expr(self):
         steps       = None
         body_node   = None
@@ -557,20 +533,75 @@ class Parser:
         if self.current_token.type == TokenType.IDENTIFIER:
             identifier = self.current_token
             self.advance()
+            if self.current_token.matches(TokenType.KEYWORD, 'in'):
+                return self.for_in_expr(position, identifier)
             if self.current_token.type != TokenType.COMMA:
-                raise SyntaxErrorDsl("Invalid syntax, expected ','", position)
+                raise SyntaxErrorDsl("Invalid syntax, expected ',' or in", position)
             self.advance()
 
-        steps = self.arith_op()
+        steps = self.operation(COMPARATION_POWER)
 
         if self.current_token.type != TokenType.COLON:
             raise SyntaxErrorDsl("Invalid syntax, expected ':'", position)
         self.advance()
 
-        body_node = self.statment()
+        body_node = self.loop_body()
 
         return ForNode(position, body_node, steps, identifier)
 
+    def for_in_expr(self, position, identifier):
+        stop = None
+        step = None
+
+        self.advance()
+        iterable = self.operation(COMPARATION_POWER)
+
+        if self.current_token.type == TokenType.COMMA:
+            self.advance()
+            stop = self.operation(COMPARATION_POWER)
+            if self.current_token.type == TokenType.COMMA:
+                self.advance()
+                step = self.operation(COMPARATION_POWER)
+
+        if self.current_token.type != TokenType.COLON:
+            raise SyntaxErrorDsl("Invalid syntax, expected ':'", self.current_token.position)
+        self.advance()
+
+        body_node = self.loop_body()
+
+        return ForInNode(position, body_node, identifier, iterable, stop, step)
+
+    # WhileNode                 while logic_operation: statment
+    ######################################################################
+    def while_expr(self):
+        position = self.current_token.position
+        self.advance()
+
+        condition = self.operation()
+
+        if self.current_token.type != TokenType.COLON:
+            raise SyntaxErrorDsl("Invalid syntax, expected ':'", self.current_token.position)
+        self.advance()
+
+        body_node = self.loop_body()
+
+        return WhileNode(position, condition, body_node)
+
+    # Parses the statment of a loop, break and continue are only valid inside one
+    def loop_body(self):
+        self.loop_depth += 1
+        body_node = self.statment()
+        self.loop_depth -= 1
+        return body_node
+
+    # Parses the statment of a function, trigger or class, the loops around the definition dont reach its body
+    def definition_body(self):
+        loop_depth = self.loop_depth
+        self.loop_depth = 0
+        body_node = self.statment()
+        self.loop_depth = loop_depth
+        return body_node
+
     # ListNode                  [ expression (, expression)*? ]
     ######################################################################
     def list_expr(self):
@@ -607,3 +638,17 @@ class Parser:
             raise SyntaxErrorDsl(f"Invalid syntax {result}", self.current_token.position)
 
         return result
+
+
+# Parsing methods of the expressions that start with a given token type or keyword
+# Any other token is parsed as a primary expression
+PREFIX_RULES = {
+    TokenType.LPAREN    : Parser.parenthesis,
+    TokenType.LSQUARE   : Parser.list_expr,
+    'function'          : Parser.func_def,
+    'trigger'           : Parser.trigger_def,
+    'class'             : Parser.class_def,
+    'if'                : Parser.if_expr,
+    'for'               : Parser.for_expr,
+    'while'             : Parser.while_expr,
+}
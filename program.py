@@ -0,0 +1,180 @@
+import os
+import pickle
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib     import blake2b
+
+from lexer      import Lexer
+from parser_    import Parser
+
+from nodes      import Node
+from optimizer  import Optimizer
+from resolver   import Resolver
+
+PROGRAM_CACHE_SIZE = 256
+OPTIMIZE            = True      # Run the Optimizer on compiled trees, can be switched off to compare results
+
+CACHE_DIRECTORY     = '__dslcache__'
+CACHE_EXTENSION     = '.dslc'
+CACHE_VERSION       = 4         # Increase when the tree or token layout changes, older cache files are ignored
+
+# Source text already run through the lexer and the parser
+# One Program is executed any number of times, from any guild or channel context
+# Executing never changes what the tree means, but some nodes keep caches filled on their first run:
+#   BinOpNode.operation         operation of the last operand types, checked against the types of every evaluation
+#   AttributeAccessNode.cache   weak references to the last object context and caller allowed to read private attributes
+#   node.code                   bytecode compiled by the VirtualMachine, it only depends on the tree
+# Every cache is either derived from the tree alone or checked before it is used,
+# and none keeps values or contexts alive, so sharing them across contexts is safe
+@dataclass
+class Program:
+    source: str
+    ast: Node
+    key: bytes = None
+    optimized: bool = False
+
+    def __repr__(self):
+        return f'<program {self.key.hex() if self.key else ""}{" optimized" if self.optimized else ""}>'
+
+# Least recently used cache of compiled programs, keyed by the hash of their source
+# Holds at most size programs, the oldest one is dropped when a new one doesnt fit
+class ProgramCache:
+
+    def __init__(self, size = PROGRAM_CACHE_SIZE):
+        self.size = size
+        self.programs = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        program = self.programs.get(key)
+        if program is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.programs.move_to_end(key)
+        return program
+
+    def add(self, program: Program):
+        self.programs[program.key] = program
+        self.programs.move_to_end(program.key)
+        if len(self.programs) > self.size:
+            self.programs.popitem(last=False)
+
+    def clear(self):
+        self.programs.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.programs)
+
+    def __repr__(self):
+        return f'<program cache {len(self)}/{self.size} hits:{self.hits} misses:{self.misses}>'
+
+program_cache = ProgramCache()
+
+# Optimized and unoptimized programs of the same source are cached apart
+def source_key(source, optimize = False):
+    return blake2b(source.encode('utf8'), digest_size=16, salt=b'optimized' if optimize else b'').digest()
+
+# Lexes, parses, optimizes and resolves the source, or returns the cached Program of an identical source
+# Lexer and parser errors are raised and never cached
+def compile(source, cache = program_cache, optimize = None):
+    optimize = OPTIMIZE if optimize is None else optimize
+    key = source_key(source, optimize)
+
+    if cache is not None:
+        program = cache.get(key)
+        if program is not None:
+            return program
+
+    tokens = Lexer(source).generate_tokens()
+    ast = Parser(tokens).parse()
+    if optimize:
+        ast = Optimizer().optimize(ast)
+    Resolver().resolve(ast)
+    program = Program(source, ast, key, optimize)
+
+    if cache is not None:
+        cache.add(program)
+    return program
+
+
+# COMPILED MODULE CACHE
+# Modules are stored compiled in a __dslcache__ directory next to them, as name.dslc
+# A cache file is used directly while the module keeps its modification time and size
+# otherwise its source hash decides if the module actually changed
+##################################
+def read_source(path):
+    with open(path, 'r', encoding='utf8') as file:
+        return strip_comments(file.read())
+
+# Comments go from '#' to the end of the line
+def strip_comments(text):
+    lines = []
+    for line in text.split('\n'):
+        if '#' in line:
+            line = line[0:line.index('#')]
+        lines.append(line)
+    return '\n'.join(lines)
+
+def cache_path(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, CACHE_DIRECTORY, os.path.splitext(name)[0] + CACHE_EXTENSION)
+
+# Returns the compiled Program of a module file, from its cache file when it is fresh
+def load(path, cache = program_cache, optimize = None):
+    optimize = OPTIMIZE if optimize is None else optimize
+    stat = os.stat(path)
+    compiled_path = cache_path(path)
+
+    header = read_cache(compiled_path)
+    if header is not None:
+        mtime, size, key, program = header
+        if mtime == stat.st_mtime_ns and size == stat.st_size and program.optimized == optimize:
+            return remember(program, cache)
+
+    source = read_source(path)
+    key = source_key(source, optimize)
+    if header is not None and header[2] == key:
+        program = header[3]
+    else:
+        program = compile(source, None, optimize)       # A fresh tree, cached trees may hold compiled vm code
+
+    write_cache(compiled_path, (stat.st_mtime_ns, stat.st_size, key, program))
+    return remember(program, cache)
+
+# Programs already in memory are preferred, they may have been compiled by the vm
+def remember(program: Program, cache):
+    if cache is None:
+        return program
+    cached = cache.get(program.key)
+    if cached is not None:
+        return cached
+    cache.add(program)
+    return program
+
+# Returns the (mtime, size, key, program) stored in a cache file, or None if it is missing or outdated
+def read_cache(compiled_path):
+    try:
+        with open(compiled_path, 'rb') as file:
+            version, *header = pickle.load(file)
+    except Exception:           # Missing, corrupted or written by an incompatible version
+        return None
+    return header if version == CACHE_VERSION else None
+
+# The cache is written to a temporary file first, readers never see half written files
+# Failing to write it (read only directories, trees too deep to pickle...) only means the module is compiled again next time
+def write_cache(compiled_path, header):
+    temporary_path = f'{compiled_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(compiled_path), exist_ok=True)
+        with open(temporary_path, 'wb') as file:
+            pickle.dump((CACHE_VERSION, *header), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, compiled_path)
+    except (OSError, pickle.PicklingError, RecursionError):
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+##################################
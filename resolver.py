@@ -0,0 +1,190 @@
+from nodes      import *
+
+from context    import FrameLayout
+
+# Names bound in the body of one function, in slot order
+class Scope:
+
+    def __init__(self, arg_names, parent = None):
+        self.names = list(arg_names)
+        self.parent = parent
+
+    def declare(self, name):
+        if name not in self.names:
+            self.names.append(name)
+
+    def index(self, name):
+        return self.names.index(name) if name in self.names else None
+
+# Binds the variables of function and trigger bodies to slots of their call Frame
+# A resolved node holds slot, the index in the frame, and depth, the number of frames to go up to find it
+#   depth 0 is the frame of the function the node is in, depth 1 the one of the function that defined it...
+# Names that arent local to any enclosing function (channel, guild and built in variables) stay unresolved
+# and are looked up by name at runtime. Class bodies run in their own object context, so they stop the
+# resolution of outer function variables
+class Resolver:
+
+    def __init__(self):
+        self.scope = None
+
+    def resolve(self, node):
+        method = getattr(self, f'resolve_{type(node).__name__}', self.resolve_generic)
+        method(node)
+        return node
+
+    def resolve_generic(self, node):
+        if not isinstance(node, Node):
+            return
+        for child in vars(node).values():
+            if isinstance(child, Node):
+                self.resolve(child)
+            elif isinstance(child, list):
+                for element in child:
+                    self.resolve(element)
+
+    # VARIABLES
+    ##################################
+    def resolve_VarAccessNode(self, node: VarAccessNode):
+        self.bind(node)
+
+    def resolve_VarAssingNode(self, node: VarAssingNode):
+        self.resolve(node.value_node)
+        self.bind(node, local=True)             # Assignments only change variables of the current table
+
+    def resolve_VarDefNode(self, node: VarDefNode):
+        self.resolve(node.value_node)
+        if self.scope is not None:
+            self.scope.declare(node.var_name_token.value)
+        self.bind(node, local=True)
+
+    # Sets the slot and depth of the node if its name belongs to an enclosing function
+    def bind(self, node: VarAccessNode, local = False):
+        name = node.var_name_token.value
+        scope = self.scope
+        depth = 0
+        while scope is not None:
+            index = scope.index(name)
+            if index is not None:
+                node.slot = index
+                node.depth = depth
+                return
+            if local:
+                return
+            scope = scope.parent
+            depth += 1
+    ##################################
+
+    # ATTRIBUTES
+    # Attribute names are looked up in the object, not in the frame
+    ##################################
+    def resolve_AttributeAccessNode(self, node: AttributeAccessNode):
+        self.resolve(node.object_value)
+        if isinstance(node.attribute_node, AttributeAccessNode):
+            self.resolve(node.attribute_node)
+
+    def resolve_AttributeAssingNode(self, node: AttributeAssingNode):
+        self.resolve_AttributeAccessNode(node)
+        self.resolve(node.value_node)
+    ##################################
+
+    # LOOPS
+    # The loop variable is bound to its frame slot, iterations write it directly
+    ##################################
+    def resolve_ForNode(self, node: ForNode):
+        self.resolve(node.steps)
+        self.bind_loop_variable(node)
+        self.resolve(node.body_node)
+
+    def resolve_ForInNode(self, node: ForInNode):
+        self.resolve(node.iterable)
+        self.resolve(node.stop)
+        self.resolve(node.step)
+        self.bind_loop_variable(node)
+        self.resolve(node.body_node)
+
+    def bind_loop_variable(self, node):
+        if self.scope is not None and node.identifier is not None:
+            self.scope.declare(node.identifier.value)
+            node.slot = self.scope.index(node.identifier.value)
+    ##################################
+
+    # FUNCTIONS
+    ##################################
+    def resolve_FuncDefNode(self, node: FuncDefNode):
+        if self.scope is not None and node.func_name_token:
+            self.scope.declare(node.func_name_token.value)
+
+        arg_names = [name_token.value for name_token in node.arg_name_tokens]
+        node.layout = self.resolve_body(node.body_node, arg_names)
+
+    def resolve_TriggerDefNode(self, node: TriggerDefNode):
+        self.resolve(node.event)
+        node.layout = self.resolve_body(node.body_node, ['message'])
+
+    def resolve_ClassDefNode(self, node: ClassDefNode):
+        if self.scope is not None and node.class_name_token:
+            self.scope.declare(node.class_name_token.value)
+
+        scope = self.scope
+        self.scope = None
+        self.resolve(node.body_node)
+        self.scope = scope
+
+    # Resolves a function body in a new scope, returns the layout of its frames
+    # Functions importing modules get their names at runtime, they keep looking variables up by name
+    def resolve_body(self, body_node, arg_names):
+        if len(set(arg_names)) != len(arg_names) or contains_import(body_node):
+            self.resolve_dynamic(body_node)
+            return None
+
+        scope = self.scope
+        self.scope = Scope(arg_names, scope)
+        declare_names(body_node, self.scope)
+        self.resolve(body_node)
+        layout = FrameLayout(self.scope.names)
+        self.scope = scope
+        return layout
+
+    def resolve_dynamic(self, body_node):
+        scope = self.scope
+        self.scope = None
+        self.resolve(body_node)
+        self.scope = scope
+    ##################################
+
+# Declares every name a function body binds before resolving it, so uses before the definition also get a slot
+def declare_names(node, scope: Scope):
+    if isinstance(node, VarDefNode):
+        scope.declare(node.var_name_token.value)
+    elif isinstance(node, (ForNode, ForInNode)) and node.identifier is not None:
+        scope.declare(node.identifier.value)
+    elif isinstance(node, FuncDefNode):
+        if node.func_name_token:
+            scope.declare(node.func_name_token.value)
+        return
+    elif isinstance(node, ClassDefNode):
+        if node.class_name_token:
+            scope.declare(node.class_name_token.value)
+        return
+    elif isinstance(node, TriggerDefNode):
+        return
+
+    if isinstance(node, Node):
+        for child in vars(node).values():
+            if isinstance(child, Node):
+                declare_names(child, scope)
+            elif isinstance(child, list):
+                for element in child:
+                    declare_names(element, scope)
+
+def contains_import(node):
+    if isinstance(node, ImportNode):
+        return True
+    if isinstance(node, (FuncDefNode, ClassDefNode, TriggerDefNode)) or not isinstance(node, Node):
+        return False
+    for child in vars(node).values():
+        if isinstance(child, Node) and contains_import(child):
+            return True
+        elif isinstance(child, list) and any(contains_import(element) for element in child):
+            return True
+    return False
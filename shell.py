@@ -2,9 +2,9 @@ import traceback
 
 from interpreter    import Interpreter
 from context        import Context, SymbolTable
-from events         import Event, EventType
+from events         import Event, EventType, TriggerRegistry
 
-from values         import BuiltInFunction, List
+from values         import BuiltInFunction, List, Message
 
 # BUILT IN FUNCTIONS
 built_ins = SymbolTable()
@@ -19,13 +19,19 @@ built_ins.define('string', BuiltInFunction.string)
 built_ins.define('length', BuiltInFunction.length)
 built_ins.define('time', BuiltInFunction.time)
 built_ins.define('dump', BuiltInFunction.dump)
+built_ins.define('array', BuiltInFunction.array)
+built_ins.define('slice', BuiltInFunction.slice)
+built_ins.define('sum', BuiltInFunction.sum)
+built_ins.define('min', BuiltInFunction.min)
+built_ins.define('max', BuiltInFunction.max)
+built_ins.define('mean', BuiltInFunction.mean)
 
 # BUILT IN FUNCTIONS
 
 
 # GLOBAL VARIABLES
 
-built_ins.define('@triggers', List([]))    # @triggers cant be accessed by users, due to @ raising IllegalCharError
+built_ins.define('@triggers', TriggerRegistry(BuiltInFunction.contains))     # @triggers cant be accessed by users, due to @ raising IllegalCharError
 built_ins.define('on_message', EventType.MESSAGE)
 
 built_ins.define('@guilds', List([]))
@@ -36,15 +42,21 @@ built_ins.define('@direct_messages', List([]))
 
 class Shell:
 
+    # core.dsl is executed into the shared built_ins table, only once per process
+    core_loaded = False
+
     def __init__(self, output_callback, guild=None, channel=None):
 
         # BUILT INS INITIALIZATION
         self.context = Context('built_ins', built_ins)
-        self.open_file('core.dsl')
+        if not Shell.core_loaded:
+            self.open_file('core.dsl')
+            Shell.core_loaded = True
 
         # ROOT CONTEXT
         symbol_table = SymbolTable(built_ins)
         self.shell = Context('shell', symbol_table)
+        built_ins.get('@triggers').add_scope(self.shell)
 
         # CALLBACK
         self.output_callback = output_callback
@@ -53,10 +65,16 @@ class Shell:
         self.change_context(guild, channel)
 
 
+    # Binds the output callback and the guild/channel context for the next command or event
+    def bind(self, output_callback, guild=None, channel=None):
+        self.output_callback = output_callback
+        self.change_context(guild, channel)
+
     # Executes a command and returns either the console output or an error message
-    def run_command(self, command):
+    # If use_vm is set, the command runs on the bytecode VirtualMachine
+    def run_command(self, command, use_vm=False):
         try:
-            return Interpreter().run(command, self.context)
+            return Interpreter().run(command, self.context, use_vm)
         except Exception as error:
             traceback.print_exc()
             return error
@@ -68,39 +86,31 @@ class Shell:
     def get_ast(self, command):
         return Interpreter().parse(command, self.context)
 
+    # Runs the triggers of the event that are global or owned by the current context hierarchy
+    # Message triggers whose keywords arent in the content are skipped without evaluating their condition
+    # The Message value is only created if a trigger matches, and shared by all of them
     def throw_event(self, event: Event):
-        trigger_list = built_ins.get('@triggers').value
+        text = event.value[0] if event.type == EventType.MESSAGE else None
+        matching = built_ins.get('@triggers').matching(event.type, self.context, text)
+        if not matching:
+            return
         interpreter = Interpreter()
 
-        matching = []
-        for trigger in trigger_list:
-            if trigger.event == event.type:
-                matching.append(trigger)
-
         if event.type == EventType.MESSAGE:
-            content, author, context = event.value
-
-            message_args = [content, author, context]
-            message_class = self.context.symbol_table.get('Message') # TODO: load core inside built_ins
-            message_object = interpreter.call(message_class, self.context, wrapped_args=[], args=message_args)
-
+            message = Message(*event.value)
             for trigger in matching:
-                interpreter.call(trigger.function, trigger.trigger_context, wrapped_args=[message_object], args=[])
+                interpreter.run_trigger(trigger, [message], text is not None)
 
 
     # Opens file, if its extension matches .dsl, executes its contents
-    # otherwise reads it as text aka console input
-    def open_file(self, path):
-        lines = []
-        with open(path, 'r', encoding='utf8') as file:
-            if file.name.split('.')[1] == 'dsl':
-                lines += file.readlines()
-                program = ''
-                for line in lines:
-                    if '#' in line:
-                        line = line[0:line.index('#')]
-                    program += line
-                return self.run_command(program)
+    # compiled modules are kept in the __dslcache__ directory next to the file
+    def open_file(self, path, use_vm=False):
+        if path.split('.')[-1] == 'dsl':
+            try:
+                return Interpreter().run_file(path, self.context, use_vm)
+            except Exception as error:
+                traceback.print_exc()
+                return error
 
 
     # CONTEXT
@@ -117,6 +127,7 @@ class Shell:
             if not guild_context:
                 guild_context = Context(guild, SymbolTable(self.shell.symbol_table), self.shell)
                 guild_context.symbol_table.define('@channels', List([]))
+                built_ins.get('@triggers').add_scope(guild_context)
                 guild_list.append(guild_context)
 
             if channel:
@@ -128,6 +139,7 @@ class Shell:
                         # break
                 if not channel_context:
                     channel_context = Context(channel, SymbolTable(guild_context.symbol_table), guild_context)
+                    built_ins.get('@triggers').add_scope(channel_context)
                     channel_list.append(channel_context)
                 self.context = channel_context
             else:
@@ -142,6 +154,7 @@ class Shell:
                     # break
             if not channel_context:
                 channel_context = Context(channel, SymbolTable(self.shell.symbol_table), self.shell)
+                built_ins.get('@triggers').add_scope(channel_context)
                 channel_list.append(channel_context)
             self.context = channel_context
 
@@ -150,3 +163,18 @@ class Shell:
 
         self.context.output = self.output_callback
     #######################################
+
+
+# Keeps one warm Shell per process instead of building a new one for every message
+# Each call binds the per message output callback and guild/channel context
+class ShellSession:
+
+    def __init__(self):
+        self.shell = None
+
+    def get_shell(self, output_callback, guild=None, channel=None):
+        if self.shell is None:
+            self.shell = Shell(output_callback, guild, channel)
+        else:
+            self.shell.bind(output_callback, guild, channel)
+        return self.shell
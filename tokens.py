@@ -1,7 +1,9 @@
-from enum import Enum
+from enum import IntEnum
 from dataclasses import dataclass
+from bisect import bisect_right
 
-class TokenType(Enum):
+# Token types are integer coded, so tokens only hold a small int
+class TokenType(IntEnum):
 
     INT             = 0     # integer numbers
     FLOAT           = 1     # floating point numbers
@@ -30,37 +32,38 @@ class TokenType(Enum):
     EOL             = 24    # end of line
     EOF             = 25    # end of file
 
-    SYMBOLS = {
-        0  : 'int',
-        1  : 'float',
-        2  : 'identifier',
-        3  : 'keyword',
-        4  : '=',
-        5  : '+',
-        6  : '-',
-        7  : '*',
-        8  : '/',
-        9  : '%',
-        10 : '(',
-        11 : ')',
-        12 : '[',
-        13 : ']',
-        14 : '==',
-        15 : '!=',
-        16 : '>',
-        17 : '<',
-        18 : '>=',
-        19 : '<=',
-        20 : 'str',
-        21 : ':',
-        22 : ',',
-        23 : '.',
-        24 : 'eol',
-        25 : 'eof'
-    }
-
     def symbol(value):
-        return TokenType.SYMBOLS.value.get(value)
+        return SYMBOLS.get(value)
+
+# Display symbol of each token type
+SYMBOLS = {
+    0  : 'int',
+    1  : 'float',
+    2  : 'identifier',
+    3  : 'keyword',
+    4  : '=',
+    5  : '+',
+    6  : '-',
+    7  : '*',
+    8  : '/',
+    9  : '%',
+    10 : '(',
+    11 : ')',
+    12 : '[',
+    13 : ']',
+    14 : '==',
+    15 : '!=',
+    16 : '>',
+    17 : '<',
+    18 : '>=',
+    19 : '<=',
+    20 : 'str',
+    21 : ':',
+    22 : ',',
+    23 : '.',
+    24 : 'eol',
+    25 : 'eof'
+}
 
 # Groups of token types that are parsed together in the same node
 @dataclass
@@ -86,13 +89,63 @@ class Position:
     def copy(self):
         return Position(self.character, self.line)
 
+# Source text of a program, line and character positions are only computed when requested
+class Source:
+    __slots__ = ('text', 'line_starts')
+
+    def __init__(self, text):
+        self.text = text
+        self.line_starts = None
+
+    # Returns the Position of an offset in the text
+    def position(self, offset):
+        if self.line_starts is None:
+            self.line_starts = [0] + [index + 1 for index, char in enumerate(self.text) if char == '\n']
+        line = bisect_right(self.line_starts, offset) - 1
+        return Position(offset - self.line_starts[line], line)
+
+    # Compact pickling for the compiled module cache, the line table is rebuilt when needed
+    def __reduce__(self):
+        return (Source, (self.text,))
+
+# Start and end offsets of a token or node in its source
+# Unpacks into (start, end) Positions for display in case of an error, end is None for single characters
+class Span:
+    __slots__ = ('source', 'start', 'end')
+
+    def __init__(self, source: Source, start: int, end: int):
+        self.source = source
+        self.start = start
+        self.end = end
+
+    def __iter__(self):
+        yield self.source.position(self.start)
+        yield self.source.position(self.end - 1) if self.end - self.start > 1 else None
+
+    def __reduce__(self):
+        return (Span, (self.source, self.start, self.end))
+
+    def __repr__(self):
+        return f'{tuple(self)}'
+
 # Holds the type and value of a token
-# Holds the position in the program string for display in case of an error
-@dataclass
+# Holds the offsets in the program source for display in case of an error
 class Token:
-    type: TokenType
-    position: tuple[Position, Position]
-    value: any = None
+    __slots__ = ('type', 'source', 'start', 'end', 'value')
+
+    def __init__(self, type: TokenType, source: Source, start: int, end: int, value = None):
+        self.type = type
+        self.source = source
+        self.start = start
+        self.end = end
+        self.value = value
+
+    @property
+    def position(self):
+        return Span(self.source, self.start, self.end)
+
+    def __reduce__(self):
+        return (Token, (self.type, self.source, self.start, self.end, self.value))
 
     def matches(self, type, value):
         return self.type == type and self.value == value
@@ -1,12 +1,17 @@
 from dataclasses import dataclass
+from array       import array
+from math        import fsum
 import time
+import weakref
 
-from context import Context, SymbolTable, AccessType
+from context import Context, SymbolTable, AccessType, Frame, FrameLayout
 from errors  import TypeErrorDsl
 from events  import EventType
+from nodes   import Node, StatmentNode, VarDefNode, FuncDefNode, ClassDefNode, TriggerDefNode, ValueNode
 
 # Parent class for base types that just hold a value
-@dataclass
+# Values are slotted and never modified once created, so the same value object can be shared
+@dataclass(slots=True)
 class Value:
     value: any
 
@@ -23,40 +28,52 @@ class Value:
     def type(self):
         return 'value'
 
-@dataclass(repr=False)
+@dataclass(repr=False, slots=True)
 class Integer(Value):
     value: float
 
+    # Returns the cached Integer of small values, a new one otherwise
+    @staticmethod
+    def of(value):
+        if SMALL_INTEGER_MIN <= value <= SMALL_INTEGER_MAX:
+            return SMALL_INTEGERS[value - SMALL_INTEGER_MIN]
+        return Integer(value)
+
     def type(self):
         return 'int'
 
-@dataclass(repr=False)
+@dataclass(repr=False, slots=True)
 class Float(Value):
     value: float
 
     def type(self):
         return 'float'
 
-@dataclass(repr=False)
+@dataclass(repr=False, slots=True)
 class String(Value):
     value: str
 
     def type(self):
         return 'str'
 
-@dataclass(repr=False)
+@dataclass(repr=False, slots=True)
 class Boolean(Value):
     value: bool
 
+    # Returns the TRUE or FALSE singleton
+    @staticmethod
+    def of(value):
+        return TRUE if value else FALSE
+
     def type(self):
         return 'bool'
 
 # Null type value, holds None
-@dataclass(repr=False)
+@dataclass(repr=False, slots=True)
 class Null(Value):
     value: None
     def __init__(self, value = None):
-        super().__init__(None)
+        self.value = None
 
     def type(self):
         return 'value'
@@ -65,7 +82,7 @@ class Null(Value):
         return 'null'
 
 # Type of value that stores a list of elements
-@dataclass(repr=False)
+@dataclass(repr=False, slots=True)
 class List(Value):
     value: any # list
 
@@ -84,14 +101,75 @@ class List(Value):
     def type(self):
         return 'list'
 
+# Homogeneous numeric array, holds a memoryview of a contiguous array.array of ints ('q') or floats ('d')
+# Slices are views of the same storage, setting an element of a slice changes the array it was taken from
+@dataclass(repr=False, slots=True)
+class Array(Value):
+    value: memoryview
+
+    # Returns an Array over the storage of an array.array
+    @staticmethod
+    def of(storage):
+        return Array(memoryview(storage))
+
+    # Returns a new Array holding the values of a List, ints if every element is an Integer, floats otherwise
+    @staticmethod
+    def from_list(elements: list):
+        typecode = 'q'
+        for element in elements:
+            if type(element) is Float:
+                typecode = 'd'
+            elif type(element) is not Integer:
+                raise TypeErrorDsl(f'array() expected numeric elements, found {element.type()}', None)
+        return Array.of(array(typecode, [element.value for element in elements]))
+
+    def is_float(self):
+        return self.value.format == 'd'
+
+    # Returns an element of the storage wrapped in its value type
+    def wrap_element(self, value):
+        return Float(value) if self.is_float() else Integer.of(value)
+
+    def get_element(self, index):
+        return self.wrap_element(self.value[int(index)])
+
+    def set_element(self, index, value):
+        if type(value) is Float and not self.is_float() or type(value) not in (Integer, Float):
+            raise TypeErrorDsl(f'cannot store {value.type()} in an {"float" if self.is_float() else "int"} array', None)
+        self.value[int(index)] = float(value.value) if self.is_float() else value.value
+
+    def get_slice(self, start, end):
+        return Array(self.value[int(start):int(end)])
+
+    def get_lenght(self):
+        return len(self.value)
+
+    def type(self):
+        return 'array'
+
+    def __repr__(self):
+        return f'array({self.value.tolist()})'
+
+# SHARED VALUES
+# Conditions are checked by identity against TRUE, booleans must always be created with Boolean.of
+##################################
+NULL                = Null()
+TRUE                = Boolean(True)
+FALSE               = Boolean(False)
+
+SMALL_INTEGER_MIN   = -128
+SMALL_INTEGER_MAX   = 1024
+SMALL_INTEGERS      = tuple(Integer(value) for value in range(SMALL_INTEGER_MIN, SMALL_INTEGER_MAX + 1))
+##################################
+
 # Python types as keys for Dsl types, for efficient Value wrapping
 _wrappers = {
-    int     : Integer,
+    int     : Integer.of,
     float   : Float,
     str     : String,
-    bool    : Boolean,
+    bool    : Boolean.of,
     list    : List,
-    type(None): Null,
+    type(None): lambda value: NULL,
 }
 
 # Parent class for all types that can be called with identifier() syntax
@@ -127,12 +205,28 @@ class Callable:
     def execute(self, args, context: Context, visit):
         pass
 
+# Raised by a return statment, caught by the call of the function it is in
+class FunctionReturn(Exception):
+
+    def __init__(self, value):
+        self.value = value
+
 # User defined function
 @dataclass(repr=False)
 class Function(Callable):
     body_node: any
     arg_names: list[tuple]
     context: Context = None
+    layout: FrameLayout = None
+
+    # With a layout, calls get a Frame with the arguments in the first slots
+    def create_context(self, args, arg_names, parent):
+        if self.layout is None:
+            return super().create_context(args, arg_names, parent)
+
+        frame = Frame(self.layout, parent.symbol_table)
+        frame.slots[0:len(args)] = args
+        return Context(self.name, frame, parent)
 
     def execute(self, args, context: Context, visit):
 
@@ -140,12 +234,23 @@ class Function(Callable):
         self.check_args(args, self.arg_names)
         new_context = self.create_context(args, self.arg_names, call_context)
 
-        result = visit(self.body_node, new_context)
-        return result
+        try:
+            return visit(self.body_node, new_context)
+        except FunctionReturn as function_return:
+            return function_return.value
 
     def __repr__(self):
         return f'<function {self.name}>'
 
+# Method of a shaped object, bound to the object it was read from
+# Holds the object so it stays alive while the method can still refer to it as 'this'
+@dataclass(repr=False)
+class Method(Function):
+    object: any = None
+
+    def __repr__(self):
+        return f'<method {self.name}>'
+
 # Built in functions
 @dataclass(repr=False)
 class BuiltInFunction(Callable):
@@ -164,24 +269,26 @@ class BuiltInFunction(Callable):
     def execute_write(self, context: Context):
         value = str(context.symbol_table.get('value'))
         context.send_output(value)
-        return Null()
+        return NULL
     execute_write.arg_names = [('value', None)]
 
     def execute_context(self, context: Context):
         context.send_output(f'{context.parent.get_hierarchy()}')
-        return Null()
+        return NULL
     execute_context.arg_names = []
 
     def execute_symbols(self, context: Context):
         context.send_output(f'{context.parent.symbol_table}')
-        return Null()
+        return NULL
     execute_symbols.arg_names = []
 
+    # Lists the triggers that events from the calling context reach
     def execute_triggers(self, context: Context):
-        trigger_list = context.get_root_context().symbol_table.parent.get("@triggers")
-        for trigger in trigger_list.value:
+        root = context.get_root_context()
+        registry = (root.symbol_table.parent or root.symbol_table).get('@triggers')
+        for trigger in registry.visible(context.parent):
             context.send_output(f'{trigger}\n')
-        return Null()
+        return NULL
     execute_triggers.arg_names = []
 
     # TODO: substitute substring and contains builtin functions for propper keywords and operators
@@ -190,13 +297,13 @@ class BuiltInFunction(Callable):
         start  = context.symbol_table.get('start').value
         end    = context.symbol_table.get('end').value
         return String(string[int(start):int(end)])
-    execute_substring.arg_names = [('string', String), ('start', Integer), ('end', Integer)]
+    execute_substring.arg_names = [('string', 'str'), ('start', 'int'), ('end', 'int')]
 
     def execute_contains(self, context: Context):
         string    = context.symbol_table.get('string').value
         substring = context.symbol_table.get('substring').value
-        return Boolean(substring in string)
-    execute_contains.arg_names = [('string', String), ('substring', String)]
+        return Boolean.of(substring in string)
+    execute_contains.arg_names = [('string', 'str'), ('substring', 'str')]
 
     def execute_string(self, context: Context):
         value = context.symbol_table.get('value').value
@@ -205,8 +312,53 @@ class BuiltInFunction(Callable):
 
     def execute_length(self, context: Context):
         value = context.symbol_table.get('list').value
-        return Integer(len(value))
-    execute_length.arg_names = ['list']
+        return Integer.of(len(value))
+    execute_length.arg_names = [('list', None)]
+
+    # ARRAYS
+    ##################################
+    def execute_array(self, context: Context):
+        elements = context.symbol_table.get('list')
+        if type(elements) is Array:
+            return Array.of(array(elements.value.format, elements.value))
+        if type(elements) is not List:
+            raise TypeErrorDsl(f'array() expected argument type list, found {elements.type()} in list', None)
+        return Array.from_list(elements.value)
+    execute_array.arg_names = [('list', None)]
+
+    def execute_slice(self, context: Context):
+        values = context.symbol_table.get('array')
+        start  = context.symbol_table.get('start').value
+        end    = context.symbol_table.get('end').value
+        return values.get_slice(start, end)
+    execute_slice.arg_names = [('array', 'array'), ('start', 'int'), ('end', 'int')]
+
+    def execute_sum(self, context: Context):
+        values = context.symbol_table.get('array')
+        return values.wrap_element(fsum(values.value) if values.is_float() else sum(values.value))
+    execute_sum.arg_names = [('array', 'array')]
+
+    def execute_min(self, context: Context):
+        values = context.symbol_table.get('array')
+        if not values.value:
+            raise TypeErrorDsl('min() of an empty array', None)
+        return values.wrap_element(min(values.value))
+    execute_min.arg_names = [('array', 'array')]
+
+    def execute_max(self, context: Context):
+        values = context.symbol_table.get('array')
+        if not values.value:
+            raise TypeErrorDsl('max() of an empty array', None)
+        return values.wrap_element(max(values.value))
+    execute_max.arg_names = [('array', 'array')]
+
+    def execute_mean(self, context: Context):
+        values = context.symbol_table.get('array')
+        if not values.value:
+            raise TypeErrorDsl('mean() of an empty array', None)
+        return Float(fsum(values.value) / len(values.value))
+    execute_mean.arg_names = [('array', 'array')]
+    ##################################
 
     def execute_time(self, context: Context):
         return Float(time.time())
@@ -214,8 +366,8 @@ class BuiltInFunction(Callable):
 
     # TODO: dump all on no arguments, dump certain variables if given as argument (?)
     def execute_dump(self, context: Context):
-        context.parent.symbol_table.symbols = {}
-        return Null()
+        context.parent.symbol_table.clear()
+        return NULL
     execute_dump.arg_names = []
 
     def __repr__(self):
@@ -231,20 +383,59 @@ BuiltInFunction.string      = BuiltInFunction('string')
 BuiltInFunction.length      = BuiltInFunction('length')
 BuiltInFunction.time        = BuiltInFunction('time')
 BuiltInFunction.dump        = BuiltInFunction('dump')
+BuiltInFunction.array       = BuiltInFunction('array')
+BuiltInFunction.slice       = BuiltInFunction('slice')
+BuiltInFunction.sum         = BuiltInFunction('sum')
+BuiltInFunction.min         = BuiltInFunction('min')
+BuiltInFunction.max         = BuiltInFunction('max')
+BuiltInFunction.mean        = BuiltInFunction('mean')
+
+# Layout shared by every instance of a class, computed once from the class body
+#   layout:     attribute names in slot order
+#   access:     access type of each slot
+#   defaults:   initial slot values, methods hold the template Function their instances get bound copies of
+#   methods:    True for the slots holding methods
+class ClassShape:
+
+    def __init__(self, template: SymbolTable):
+        names = list(template.symbols)
+        variables = [template.symbols[name] for name in names]
+
+        self.layout = FrameLayout(names)
+        self.access = tuple(variable.access for variable in variables)
+        self.defaults = tuple(variable.value for variable in variables)
+        self.methods = tuple(isinstance(variable.value, Function) for variable in variables)
+
+    def __repr__(self):
+        return f'<shape {", ".join(self.layout.names)}>'
 
 # User defined class, calling a class returns an object, instance of the class
+# Classes whose body only defines literal attributes and methods get a ClassShape on their first call
+# and their instances are created by copying its defaults, other classes run their body for every instance
 @dataclass(repr=False)
 class Class(Callable):
     body_node: any
 
+    shape = None
+    shaped = None       # Unknown until the first call
+
     def execute(self, args, context: Context, visit):
 
-        new_symbol_table = SymbolTable(context.symbol_table)
-        instance_context = Context(self.name, new_symbol_table, context)
+        if self.shaped is None:
+            self.shape = self.create_shape(visit)
+            self.shaped = self.shape is not None
+
+        if self.shaped:
+            object_table = ObjectTable(self.shape, context.symbol_table)
+            instance_context = Context(self.name, object_table, context)
+            new_object = Object(self.name, instance_context, self.shape)
+        else:
+            new_symbol_table = SymbolTable(context.symbol_table)
+            instance_context = Context(self.name, new_symbol_table, context)
 
-        visit(self.body_node, instance_context)
+            self.run_body(visit, instance_context)
 
-        new_object = Object(self.name, instance_context)
+            new_object = Object(self.name, instance_context)
 
         constructor = instance_context.symbol_table.get_local(self.name)
         if constructor:
@@ -254,50 +445,256 @@ class Class(Callable):
 
         return new_object
 
+    # Runs a class body made only of literal attributes and methods into a template table
+    # Literal values are never modified, so every instance can start with the same value objects
+    # Returns None for any other class body, or if a method defines functions, classes or triggers
+    # those outlive the call and must keep the object alive, that a shaped object context only holds by a weak reference
+    def create_shape(self, visit):
+        if not isinstance(self.body_node, StatmentNode):
+            return None
+        for element_node in self.body_node.element_nodes:
+            if isinstance(element_node, VarDefNode):
+                if element_node.value_node is not None and not isinstance(element_node.value_node, ValueNode):
+                    return None
+            elif not (isinstance(element_node, FuncDefNode) and element_node.func_name_token):
+                return None
+            elif defines_closures(element_node.body_node):
+                return None
+
+        template = Context(self.name, SymbolTable())
+        self.run_body(visit, template)
+        if 'this' in template.symbol_table.symbols:
+            return None
+        return ClassShape(template.symbol_table)
+
+    # A return in the class body only ends the body
+    def run_body(self, visit, context: Context):
+        try:
+            visit(self.body_node, context)
+        except FunctionReturn:
+            pass
+
     def __repr__(self):
         return f'<class {self.name}>'
 
+# Checks if a node defines functions, classes or triggers
+def defines_closures(node):
+    if isinstance(node, (FuncDefNode, ClassDefNode, TriggerDefNode)):
+        return True
+    if not isinstance(node, Node):
+        return False
+    for child in vars(node).values():
+        if isinstance(child, Node) and defines_closures(child):
+            return True
+        elif isinstance(child, list) and any(defines_closures(element) for element in child):
+            return True
+    return False
+
+# Attribute table of a shaped object, its slots start as a copy of the class defaults
+# 'this' is held by a weak reference, so the object and its context dont form a reference cycle
+# Methods are bound to the object when they are read
+class ObjectTable(Frame):
+
+    def __init__(self, shape: ClassShape, parent = None):
+        SymbolTable.__init__(self, parent)
+        self.layout = shape.layout
+        self.shape = shape
+        self.slots = list(shape.defaults)
+        self.object = None
+
+    # Returns the object of the table, raises an error if only its context was left and the object was collected
+    def this(self):
+        this = self.object()
+        if this is None:
+            raise TypeErrorDsl('this no longer exists, its object was collected', None)
+        return this
+
+    def slot_value(self, index):
+        value = self.slots[index]
+        if self.shape.methods[index] and value is self.shape.defaults[index]:
+            this = self.this()
+            value = Method(value.name, value.body_node, value.arg_names, this.object_context, value.layout, this)
+        return value
+
+    def get(self, name):
+        if name == 'this':
+            return self.this()
+        index = self.layout.index.get(name)
+        if index is not None and self.slots[index] is not None:
+            return self.slot_value(index)
+        return SymbolTable.get(self, name)
+
+    def get_local(self, name):
+        if name == 'this':
+            return self.this()
+        index = self.layout.index.get(name)
+        if index is not None and self.slots[index] is not None:
+            return self.slot_value(index)
+        return SymbolTable.get_local(self, name)
+
+    def get_access(self, name):
+        if name == 'this':
+            return AccessType.PRIVATE
+        index = self.layout.index.get(name)
+        if index is not None and self.slots[index] is not None:
+            return self.shape.access[index]
+        return SymbolTable.get_access(self, name)
+
+    def exists(self, name):
+        return name == 'this' or super().exists(name)
+
 # Intance of a class
 @dataclass(repr=False)
 class Object:
     class_name: str
     object_context: Context
+    shape: ClassShape = None
 
-    def __init__(self, class_name: str, object_context: Context):
+    def __init__(self, class_name: str, object_context: Context, shape: ClassShape = None):
         self.class_name = class_name
         self.object_context = object_context
-
-        self.object_context.symbol_table.define('this', self, access=AccessType.PRIVATE)
-
-    def get(self, name: str, context: Context = None):
-        table = self.object_context.symbol_table
-        if self.object_context in context.get_hierarchy():
-            return table.get_local(name)
-        elif table.get_access(name) == AccessType.PUBLIC:
-            return table.get_local(name)
-
-    def set(self, name: str, value, context: Context = None):
-        table = self.object_context.symbol_table
-        if self.object_context in context.get_hierarchy():
-            return table.set(name, value)
-        elif table.get_access(name) == AccessType.PUBLIC:
-            return table.set(name, value)
+        self.shape = shape
+
+        if shape is None:
+            self.object_context.symbol_table.define('this', self, access=AccessType.PRIVATE)
+        else:
+            self.object_context.symbol_table.object = weakref.ref(self)
+
+    # Public attributes are always visible, private ones only from inside the object context hierarchy
+    # The cache of the accessing node skips the hierarchy check for the last context it allowed
+    def get(self, name: str, context: Context = None, cache = None):
+        if self.shape is not None:
+            table = self.object_context.symbol_table
+            access = table.get_access(name)
+            if access is AccessType.PUBLIC or (access is not None and self.can_access_private(context, cache)):
+                return table.get_local(name)
+            return None
+
+        variable = self.object_context.symbol_table.symbols.get(name)
+        if variable is None:
+            return None
+        if variable.access is AccessType.PUBLIC or self.can_access_private(context, cache):
+            return variable.value
+
+    def set(self, name: str, value, context: Context = None, cache = None):
+        if self.shape is not None:
+            table = self.object_context.symbol_table
+            access = table.get_access(name)
+            if access is AccessType.PUBLIC or (access is not None and self.can_access_private(context, cache)):
+                table.set(name, value)
+            return None
+
+        variable = self.object_context.symbol_table.symbols.get(name)
+        if variable is None:
+            return None
+        if variable.access is AccessType.PUBLIC or self.can_access_private(context, cache):
+            variable.value = value
+
+    def can_access_private(self, context: Context, cache = None):
+        if cache is not None and cache.allows(self.object_context, context):
+            return True
+        if context.is_inside(self.object_context):
+            if cache is not None:
+                cache.store(self.object_context, context)
+            return True
+        return False
 
     def type(self):
         return f'{self.class_name}'
 
     def copy(self):
-        return Object(self.class_name, self.object_context)
+        return Object(self.class_name, self.object_context, self.shape)
 
     def __repr__(self):
         return f'<{self.class_name} object>'
 
+# Native message of a MESSAGE event, created once per event and shared by every trigger it runs
+# Its attributes are read only, each one is wrapped into a value on its first read
+class Message(Object):
+
+    def __init__(self, content, author, context):
+        self.class_name = 'Message'
+        self.object_context = None
+        self.shape = None
+        self.attributes = {'content': content, 'author': author, 'context': context}
+        self.values = {}
+
+    def get(self, name: str, context: Context = None, cache = None):
+        value = self.values.get(name)
+        if value is None and name in self.attributes:
+            value = Value(self.attributes[name]).wrap()
+            self.values[name] = value
+        return value
+
+    def set(self, name: str, value, context: Context = None, cache = None):
+        raise TypeErrorDsl(f'{name} attribute of a message cant be modified', None)
+
+    def copy(self):
+        return self
+
+# Inline cache of an attribute node, remembers the last context that could see the private attributes of an object
+# A context hierarchy never changes, so the pair stays valid
+# Nodes are shared by every context running a cached program, the pair is held by weak references
+# so the cache never keeps a dead object or caller context alive
+class AttributeCache:
+    __slots__ = ('object_context', 'context')
+
+    def __init__(self):
+        self.object_context = None
+        self.context = None
+
+    def allows(self, object_context: Context, context: Context):
+        return self.object_context is not None and self.object_context() is object_context and self.context() is context
+
+    def store(self, object_context: Context, context: Context):
+        self.object_context = weakref.ref(object_context)
+        self.context = weakref.ref(context)
+
+# Condition of a trigger, evaluated before its body is called
+# The condition runs in a context kept by the guard, each event only binds the arguments in it
+# With exact set, the condition is true whenever the trigger keywords are in the message
+@dataclass(repr=False)
+class Guard:
+    condition: any
+    arg_names: list[tuple]
+    context: Context
+    exact: bool = False
+
+    def __init__(self, condition, arg_names, parent: Context, layout: FrameLayout = None, exact = False):
+        self.condition = condition
+        self.arg_names = arg_names
+        symbol_table = Frame(layout, parent.symbol_table) if layout else SymbolTable(parent.symbol_table)
+        self.context = Context('@trigger_guard', symbol_table, parent)
+        self.exact = exact
+
+    # Returns True if the condition holds for the arguments, keyword_found if the prefilter found a keyword
+    # The keyword decides the condition only while contains is the built in function
+    def check(self, args, visit, keyword_found = False):
+        if self.exact and keyword_found and self.context.symbol_table.get('contains') is BuiltInFunction.contains:
+            return True
+
+        symbol_table = self.context.symbol_table
+        for (arg_name, arg_type), arg_value in zip(self.arg_names, args):
+            symbol_table.define(arg_name, arg_value)
+        try:
+            return visit(self.condition, self.context) is TRUE
+        finally:
+            symbol_table.clear()
+
 # Holds the event key and function of a trigger
+# keywords are the literals a message must contain for the trigger to run, None if it may run on any message
+# The function only holds the body, the condition is checked by the guard first, None if it has no condition
 @dataclass
 class Trigger:
     event: EventType
     function: Function
     trigger_context: Context
+    keywords: frozenset = None
+    guard: Guard = None
+
+    order = 0       # Definition order set by the TriggerRegistry
 
     def __repr__(self):
-        return f'ON_{self.event.name} : {self.function.body_node}'
\ No newline at end of file
+        if self.guard is None:
+            return f'ON_{self.event.name} : {self.function.body_node}'
+        return f'ON_{self.event.name} : IF {self.guard.condition}: {self.function.body_node}'
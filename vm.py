@@ -0,0 +1,290 @@
+from compiler   import *
+from values     import *
+
+from context    import Context
+
+from interpreter import Interpreter
+
+from errors     import TypeErrorDsl, IndexErrorDsl, RecursionErrorDsl
+
+MAX_CALL_DEPTH = 10000      # Default limit of nested calls, frames live in a python list so it isnt bound to the python stack
+
+# Stack based execution engine with the same semantics as the tree walking Interpreter
+# Nodes are compiled once into a Code instruction stream, cached on the node itself
+# Calls to user defined functions push a frame instead of recursing through python
+# return f(...) replaces the frame of the current call instead of pushing a new one
+class VirtualMachine(Interpreter):
+
+    def __init__(self, max_depth = MAX_CALL_DEPTH):
+        self.max_depth = max_depth
+        self.depth = 0          # Frames pushed and visits entered that didnt return yet
+
+    # Every visit from values (class bodies, built in callbacks...) runs through the virtual machine
+    # A visit counts as one more call, it is the way back in for constructors and built in callbacks
+    def visit(self, node, context: Context):
+        depth = self.depth
+        if depth >= self.max_depth:
+            raise RecursionErrorDsl(f'maximum call depth of {self.max_depth} exceeded', None)
+        self.depth = depth + 1
+        try:
+            return self.execute_code(self.compile(node), context)
+        finally:
+            self.depth = depth      # Frames left behind by an error are dropped with it
+
+    def run(self, command, context, use_vm = True):
+        return super().run(command, context, use_vm)
+
+    # Returns the compiled Code of the node, compiling it only on the first call
+    def compile(self, node):
+        code = getattr(node, 'code', None)
+        if code is None:
+            code = Compiler().compile(node)
+            if node is not None:
+                node.code = code
+        return code
+
+    def execute_code(self, code: Code, context: Context):
+        frames = []
+        instructions = code.instructions
+        stack = []
+        pc = 0
+
+        while True:
+            opcode, argument = instructions[pc]
+            pc += 1
+
+            if opcode == LOAD_CONST:
+                stack.append(argument)
+
+            elif opcode == LOAD_NAME:
+                name, node = argument
+                value = context.symbol_table.get(name)
+                if not value:
+                    raise TypeErrorDsl(f'{name} is not defined', node.position)
+                stack.append(value)
+
+            elif opcode == LOAD_SLOT:
+                slot, depth, name, node = argument
+                table = context.symbol_table
+                while depth:
+                    table = table.parent
+                    depth -= 1
+                value = table.slots[slot]
+                if value is None:
+                    value = table.get(name)
+                    if not value:
+                        raise TypeErrorDsl(f'{name} is not defined', node.position)
+                stack.append(value)
+
+            elif opcode == STORE_SLOT:
+                slot, name, node = argument
+                table = context.symbol_table
+                if table.slots[slot] is not None:
+                    table.slots[slot] = stack.pop()
+                else:
+                    if not table.exists(name):
+                        raise TypeErrorDsl(f'{name} is not defined', node.position)
+                    table.set(name, stack.pop())
+                stack.append(NULL)
+
+            elif opcode == DEFINE_SLOT:
+                context.symbol_table.slots[argument] = stack.pop()
+                stack.append(NULL)
+
+            elif opcode == POP:
+                stack.pop()
+
+            elif opcode == BINARY_OP:
+                op_token, node = argument
+                left = stack.pop()
+                right = stack.pop()
+                stack.append(self.binary_operation(left, op_token, right, node))
+
+            elif opcode == JUMP_IF_DECIDED:
+                op_token, target = argument
+                if self.short_circuits(stack[-1], op_token):
+                    pc = target
+
+            elif opcode == LOGIC_OP:
+                op_token, node = argument
+                right = stack.pop()
+                left = stack.pop()
+                stack.append(self.binary_operation(left, op_token, right, node))
+
+            elif opcode == STORE_NAME:
+                name, node = argument
+                if not context.symbol_table.exists(name):
+                    raise TypeErrorDsl(f'{name} is not defined', node.position)
+                context.symbol_table.set(name, stack.pop())
+                stack.append(NULL)
+
+            elif opcode == FOR_ITER:
+                (name, slot), target = argument
+                value = next(stack[-1], None)
+                if value is None:
+                    pc = target
+                elif slot is not None:
+                    context.symbol_table.slots[slot] = value
+                elif name is not None:
+                    context.symbol_table.set(name, value)
+
+            elif opcode == JUMP_UNWIND:
+                height, target = argument
+                del stack[height:]
+                pc = target
+
+            elif opcode == JUMP:
+                pc = argument
+
+            elif opcode == JUMP_IF_NOT_TRUE:
+                if stack.pop() is not TRUE:
+                    pc = argument
+
+            elif opcode == CALL:
+                count, node = argument
+                if count:
+                    args = stack[-count:]
+                    del stack[-count:]
+                else:
+                    args = []
+                function = stack.pop()
+
+                if not isinstance(function, Callable):
+                    raise TypeErrorDsl((f'{node.func_node} is not callable'), node.position)
+
+                if type(function) is Function or type(function) is Method:
+                    if self.depth >= self.max_depth:
+                        raise RecursionErrorDsl(f'maximum call depth of {self.max_depth} exceeded', node.position)
+                    call_context = context if function.context is None else function.context
+                    function.check_args(args, function.arg_names)
+
+                    frames.append((instructions, pc, stack, context))
+                    self.depth += 1
+                    context = function.create_context(args, function.arg_names, call_context)
+                    instructions = self.compile(function.body_node).instructions
+                    stack = []
+                    pc = 0
+                else:
+                    stack.append(function.execute(args, context, self.visit))
+
+            elif opcode == RETURN_VALUE:
+                result = stack.pop()
+                if not frames:
+                    return result
+                self.depth -= 1
+                instructions, pc, stack, context = frames.pop()
+                stack.append(result)
+
+            elif opcode == TAIL_CALL:
+                count, node = argument
+                if count:
+                    args = stack[-count:]
+                    del stack[-count:]
+                else:
+                    args = []
+                function = stack.pop()
+
+                if not isinstance(function, Callable):
+                    raise TypeErrorDsl((f'{node.func_node} is not callable'), node.position)
+
+                if type(function) is Function or type(function) is Method:
+                    call_context = context if function.context is None else function.context
+                    function.check_args(args, function.arg_names)
+
+                    context = function.create_context(args, function.arg_names, call_context)
+                    instructions = self.compile(function.body_node).instructions
+                    stack = []
+                    pc = 0
+                else:
+                    result = function.execute(args, context, self.visit)
+                    if not frames:
+                        return result
+                    self.depth -= 1
+                    instructions, pc, stack, context = frames.pop()
+                    stack.append(result)
+
+            elif opcode == DEFINE_NAME:
+                name, access = argument
+                context.symbol_table.define(name, stack.pop(), access)
+                stack.append(NULL)
+
+            elif opcode == ATTR_GET:
+                name, node = argument
+                object_value = stack.pop()
+                if not isinstance(object_value, Object):
+                    raise TypeErrorDsl(f'{object_value} is not an object', node.position)
+                attribute_value = object_value.get(name, context, self.attribute_cache(node))
+                if attribute_value == None:
+                    raise TypeErrorDsl(f'{node.attribute_node} is not defined', node.position)
+                stack.append(attribute_value)
+
+            elif opcode == ATTR_SET:
+                name, node = argument
+                value = stack.pop()
+                object_value = stack.pop()
+                if not isinstance(object_value, Object):
+                    raise TypeErrorDsl(f'{object_value} is not an object', node.position)
+                object_value.set(name, value, context, self.attribute_cache(node))
+                stack.append(NULL)
+
+            elif opcode == UNARY_OP:
+                stack.append(self.unary_operation(argument, stack.pop()))
+
+            elif opcode == LIST_GET:
+                index = stack.pop()
+                list_var = stack.pop()
+                if index.value > list_var.get_lenght():
+                    raise IndexErrorDsl(f'index out of range', argument.position)
+                stack.append(list_var.get_element(index.value))
+
+            elif opcode == LIST_SET:
+                value = stack.pop()
+                index = stack.pop()
+                list_var = stack.pop()
+                if index.value > list_var.get_lenght():
+                    raise IndexErrorDsl(f'index out of range', argument.position)
+                list_var.set_element(index.value, value)
+                stack.append(NULL)
+
+            elif opcode == BUILD_LIST:
+                if argument:
+                    elements = stack[-argument:]
+                    del stack[-argument:]
+                else:
+                    elements = []
+                stack.append(List(elements))
+
+            elif opcode == FOR_SETUP:
+                context.symbol_table.define(argument, NULL)
+
+            elif opcode == GET_ITER:
+                stack.append(self.iterate(stack.pop(), argument))
+
+            elif opcode == GET_RANGE:
+                step = stack.pop()
+                stop = stack.pop()
+                stack.append(self.iterate_range(stack.pop(), stop, step, argument))
+
+            elif opcode == FOR_END:
+                name, slot = argument
+                stack.pop()
+                if slot is not None:
+                    context.symbol_table.slots[slot] = None
+                elif name is not None:
+                    context.symbol_table.remove(name)
+                stack.append(NULL)
+
+            elif opcode == MAKE_FUNCTION:
+                func_name, body_node, args, access, layout = argument
+                function = Function(func_name, body_node, args, context, layout)
+                if func_name:
+                    context.symbol_table.define(func_name, function, access)
+                    stack.append(NULL)
+                else:
+                    stack.append(function)
+
+            elif opcode == VISIT:
+                stack.append(Interpreter.visit(self, argument, context))
+
+            else:
+                raise Exception(f'Unknown opcode {opcode}')